@@ -45,6 +45,17 @@ doc_events = {
     "Communication": {
         "after_insert": "raven_ai_agent.skills.crm_agent.agents.meeting_capturer.on_communication_after_insert"
     },
+    # --- formulation_reader response cache -------------------------------
+    "Batch": {
+        "on_update": "raven_ai_agent.skills.formulation_reader.skill.bump_cache_epoch",
+        "on_trash": "raven_ai_agent.skills.formulation_reader.skill.bump_cache_epoch"
+    },
+    # Bin quantities are written with db_set (no Bin on_update), so stock
+    # postings bump instead; one bump per transaction, after commit
+    "Stock Ledger Entry": {
+        "on_submit": "raven_ai_agent.skills.formulation_reader.skill.bump_cache_epoch",
+        "on_cancel": "raven_ai_agent.skills.formulation_reader.skill.bump_cache_epoch"
+    },
 }
 
 # App lifecycle hooks
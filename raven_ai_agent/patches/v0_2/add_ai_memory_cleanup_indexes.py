@@ -0,0 +1,20 @@
+"""
+Patch — indexes for the AI Memory retention cleanup.
+
+cleanup_old_memories deletes rows whose expires_on has passed, or old
+Low/Normal memories; (expires_on) and (importance, creation) let both
+halves of that DELETE walk an index instead of scanning the table. Fresh
+installs get the same indexes from the DocType's on_doctype_update().
+
+Idempotent. Safe to re-run.
+"""
+import frappe
+
+from raven_ai_agent.raven_ai_agent.doctype.ai_memory.ai_memory import on_doctype_update
+
+
+def execute():
+    """Add the AI Memory cleanup indexes if missing."""
+    if not frappe.db.table_exists("AI Memory"):
+        return
+    on_doctype_update()
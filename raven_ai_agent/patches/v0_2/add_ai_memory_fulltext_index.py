@@ -0,0 +1,21 @@
+"""
+Patch — FULLTEXT index on AI Memory content.
+
+search_similar_memories used content LIKE '%query%', which cannot use a
+B-tree index and scans the whole table. ft_content lets it rank with
+MATCH ... AGAINST through an inverted index instead. MariaDB only; other
+databases keep the LIKE search. Fresh installs get the index from the
+DocType's on_doctype_update().
+
+Idempotent. Safe to re-run.
+"""
+import frappe
+
+from raven_ai_agent.raven_ai_agent.doctype.ai_memory.ai_memory import on_doctype_update
+
+
+def execute():
+    """Add the ft_content FULLTEXT index (and the cleanup indexes) if missing."""
+    if not frappe.db.table_exists("AI Memory"):
+        return
+    on_doctype_update()
@@ -0,0 +1,21 @@
+"""
+Patch — covering indexes for AI Usage Log budget and report queries.
+
+CostMonitor sums cost_usd over a timestamp range on every record_usage
+call; (timestamp, cost_usd) makes that an index-only range scan instead
+of a full table scan. (user, timestamp) serves per-user usage lookups.
+
+The AI Usage Log DocType is not shipped with this app (CostMonitor
+tolerates its absence), so sites without the table are skipped.
+
+Idempotent. Safe to re-run.
+"""
+import frappe
+
+
+def execute():
+    """Add the usage-log indexes if the table exists and they are missing."""
+    if not frappe.db.table_exists("AI Usage Log"):
+        return
+    frappe.db.add_index("AI Usage Log", ["timestamp", "cost_usd"], index_name="idx_ts_cost")
+    frappe.db.add_index("AI Usage Log", ["user", "timestamp"], index_name="idx_user_ts")
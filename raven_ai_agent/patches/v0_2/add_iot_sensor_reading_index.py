@@ -0,0 +1,22 @@
+"""
+Patch — composite index for latest/history IoT Sensor Reading lookups.
+
+The sensor skills filter on device_name + sensor_type and read newest
+first, so (device_name, sensor_type, creation) turns the ORDER BY ... LIMIT
+into a backward index range scan instead of a filesort. Fresh installs get
+the same index from the DocType's on_doctype_update().
+
+Idempotent. Safe to re-run.
+"""
+import frappe
+
+from raven_ai_agent.raven_ai_agent.doctype.iot_sensor_reading.iot_sensor_reading import (
+    on_doctype_update,
+)
+
+
+def execute():
+    """Add the (device_name, sensor_type, creation) index if missing."""
+    if not frappe.db.table_exists("IoT Sensor Reading"):
+        return
+    on_doctype_update()
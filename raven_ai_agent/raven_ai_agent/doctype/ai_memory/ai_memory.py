@@ -18,3 +18,13 @@ class AIMemory(Document):
             })
             if existing:
                 frappe.throw("This critical fact already exists")
+
+
+def on_doctype_update():
+    # cleanup_old_memories deletes by expiry, and by importance + age
+    frappe.db.add_index("AI Memory", ["expires_on"])
+    frappe.db.add_index("AI Memory", ["importance", "creation"])
+    # search_similar_memories ranks with MATCH ... AGAINST (MariaDB only)
+    if frappe.db.db_type == "mariadb" and not frappe.db.sql(
+            "SHOW INDEX FROM `tabAI Memory` WHERE Key_name = 'ft_content'"):
+        frappe.db.sql_ddl("ALTER TABLE `tabAI Memory` ADD FULLTEXT INDEX ft_content (content)")
@@ -21,3 +21,8 @@ class IoTSensorReading(Document):
             frappe.throw("Humidity must be between 0 and 100%")
         if self.battery_level is not None and (self.battery_level < 0 or self.battery_level > 100):
             frappe.throw("Battery level must be between 0 and 100%")
+
+
+def on_doctype_update():
+    # Latest/history lookups filter device + sensor type, newest first
+    frappe.db.add_index("IoT Sensor Reading", ["device_name", "sensor_type", "creation"])
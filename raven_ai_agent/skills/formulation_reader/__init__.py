@@ -22,6 +22,7 @@ from raven_ai_agent.skills.formulation_reader.reader import (
     COAParameter,
     Cunete,
     BatchAMBRecord,
+    BatchRow,
     BlendInput,
     BlendParameterResult,
     BlendSimulationResult,
@@ -47,6 +48,7 @@ __all__ = [
     "COAParameter",
     "Cunete",
     "BatchAMBRecord",
+    "BatchRow",
     "BlendInput",
     "BlendParameterResult",
     "BlendSimulationResult",
@@ -0,0 +1,32 @@
+"""
+Formulation Reader Numeric Kernels
+==================================
+
+Weighted-average core used by blend simulation (and checked against the
+golden test data), run as NumPy array operations.
+"""
+
+from typing import Sequence, Tuple
+
+import numpy as np
+
+
+def weighted_sums(values: Sequence[float], masses: Sequence[float]) -> Tuple[float, float]:
+    """
+    Sum of value * mass and total mass.
+
+    Args:
+        values: Parameter values per input
+        masses: Mass in kg per input (same length as values)
+
+    Returns:
+        (total_weighted, total_mass)
+    """
+    masses = np.asarray(masses, dtype=np.float64)
+    return float(np.asarray(values, dtype=np.float64) @ masses), float(masses.sum())
+
+
+def weighted_avg(values: Sequence[float], masses: Sequence[float]) -> float:
+    """Mass-weighted average of values; 0.0 when the total mass is zero."""
+    s, w = weighted_sums(values, masses)
+    return s / w if w else 0.0
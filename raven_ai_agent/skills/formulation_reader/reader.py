@@ -25,9 +25,13 @@ All operations are READ-ONLY. No data modifications are allowed.
 """
 
 import frappe
+import re
 from typing import Dict, List, Optional, Any, Union
-from dataclasses import dataclass, field
-from decimal import Decimal
+from dataclasses import asdict, dataclass, field
+
+# Parameters blended from at least this many cunetes are averaged with the
+# array kernel (see kernels.py); smaller blends stay in pure Python.
+KERNEL_MIN_INPUTS = 32
 
 
 # ===========================================
@@ -102,6 +106,23 @@ class BatchAMBRecord:
     coa_amb2_name: Optional[str] = None
 
 
+@dataclass(slots=True, frozen=True)
+class BatchRow:
+    """Available batch (Bin stock + parsed golden number), as returned by get_available_batches."""
+    item_code: str
+    batch_name: Optional[str]
+    warehouse: str
+    qty: float
+    product: str
+    folio: int
+    year: int
+    fefo_key: int
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict form for JSON responses and dict-based callers."""
+        return asdict(self)
+
+
 @dataclass
 class BlendInput:
     """Input for blend simulation."""
@@ -208,14 +229,47 @@ def parse_golden_number(item_code: str) -> Optional[Dict[str, Any]]:
         return None
 
 
+def golden_number_like(product_code: Optional[str] = None, year: Optional[int] = None) -> str:
+    """
+    Build a SQL LIKE pattern matching golden-number item codes.
+    
+    Lets the database filter on the product/year segments of
+    ITEM_[product(4)][folio(3)][year(2)][plant(1)] instead of Python.
+    
+    Example: golden_number_like('0617', 2023) -> 'ITEM\\_0617___23_'
+    """
+    product = product_code if product_code else "____"
+    yy = f"{year % 100:02d}" if year else "__"
+    return f"ITEM\\_{product}___{yy}_"
+
+
+def golden_number_regexp(product_code: Optional[str] = None, year: Optional[int] = None) -> str:
+    """
+    Build a SQL REGEXP pattern matching only parseable golden numbers.
+    
+    Unlike golden_number_like, the folio and year segments must be digits,
+    so a LIMITed query never spends its rows on codes that
+    parse_golden_number would reject.
+    
+    Example: golden_number_regexp('0617', 2023) -> '^ITEM_0617[0-9]{3}23.$'
+    """
+    product = re.escape(product_code) if product_code else ".{4}"
+    yy = f"{year % 100:02d}" if year else "[0-9]{2}"
+    return f"^ITEM_{product}[0-9]{{3}}{yy}.$"
+
+
 # ===========================================
 # Standalone Functions (from spec section 4)
 # ===========================================
 
 def get_available_batches(
     product_code: Optional[str] = None,
-    warehouse: str = 'FG to Sell Warehouse - AMB-W'
-) -> List[Dict[str, Any]]:
+    warehouse: str = 'FG to Sell Warehouse - AMB-W',
+    year: Optional[int] = None,
+    limit: Optional[int] = None,
+    order: str = 'fefo_asc',
+    as_rows: bool = False
+) -> List[Union[Dict[str, Any], BatchRow]]:
     """
     Get all batches with available stock, sorted by FEFO.
     
@@ -225,23 +279,34 @@ def get_available_batches(
     Args:
         product_code: Optional 4-digit product code to filter (e.g., '0612')
         warehouse: Warehouse to query (default: 'FG to Sell Warehouse - AMB-W')
+        year: Optional full year (e.g., 2023); filtered in SQL on the golden number
+        limit: Optional maximum rows; ordering and limit are applied in SQL
+        order: 'fefo_asc' (oldest first) or 'fefo_desc' (newest first)
+        as_rows: Return slotted BatchRow objects instead of dicts
         
     Returns:
-        List of batch dicts sorted by FEFO key (oldest first), each containing:
+        List of batches sorted by FEFO key, each containing:
         - item_code, batch_name, warehouse, qty, product, folio, year, fefo_key
     """
-    # Build filters for Bin query
-    filters = {'actual_qty': ['>', 0]}
-    if warehouse:
-        filters['warehouse'] = warehouse
+    descending = order == 'fefo_desc'
     
-    # Get bins with stock
-    bins = frappe.get_all('Bin',
-        filters=filters,
-        fields=['item_code', 'warehouse', 'actual_qty']
-    )
+    if limit:
+        bins = _get_bins_fefo_ordered(product_code, warehouse, year, limit, descending)
+    else:
+        # Build filters for Bin query
+        filters = {'actual_qty': ['>', 0]}
+        if warehouse:
+            filters['warehouse'] = warehouse
+        if product_code or year:
+            filters['item_code'] = ['like', golden_number_like(product_code, year)]
+        
+        # Get bins with stock
+        bins = frappe.get_all('Bin',
+            filters=filters,
+            fields=['item_code', 'warehouse', 'actual_qty']
+        )
     
-    results = []
+    matched = []
     for bin_record in bins:
         parsed = parse_golden_number(bin_record.item_code)
         if not parsed:
@@ -250,31 +315,80 @@ def get_available_batches(
         # Filter by product code if specified
         if product_code and parsed['product'] != product_code:
             continue
+        if year and parsed['full_year'] != year:
+            continue
         
-        # Get batch info for this item
-        batches = frappe.get_all('Batch',
-            filters={'item': bin_record.item_code},
-            fields=['name', 'batch_qty', 'expiry_date'],
-            limit=1
+        matched.append((bin_record, parsed))
+    
+    # One Batch query for all matched items instead of one per bin
+    batch_names: Dict[str, str] = {}
+    if matched:
+        batch_rows = frappe.get_all('Batch',
+            filters={'item': ['in', list({b.item_code for b, _ in matched})]},
+            fields=['name', 'item']
         )
-        
-        batch_name = batches[0].name if batches else None
-        
-        results.append({
-            'item_code': bin_record.item_code,
-            'batch_name': batch_name,
-            'warehouse': bin_record.warehouse,
-            'qty': bin_record.actual_qty,
-            'product': parsed['product'],
-            'folio': parsed['folio'],
-            'year': parsed['full_year'],
-            'fefo_key': parsed['fefo_key']
-        })
+        for row in batch_rows:
+            batch_names.setdefault(row.item, row.name)
+    
+    rows = [
+        BatchRow(
+            item_code=bin_record.item_code,
+            batch_name=batch_names.get(bin_record.item_code),
+            warehouse=bin_record.warehouse,
+            qty=bin_record.actual_qty,
+            product=parsed['product'],
+            folio=parsed['folio'],
+            year=parsed['full_year'],
+            fefo_key=parsed['fefo_key'],
+        )
+        for bin_record, parsed in matched
+    ]
     
-    # Sort by FEFO key (oldest first)
-    results.sort(key=lambda x: x['fefo_key'])
+    # Sort by FEFO key (oldest first unless fefo_desc)
+    rows.sort(key=lambda row: row.fefo_key, reverse=descending)
+    if limit:
+        rows = rows[:limit]
     
-    return results
+    if as_rows:
+        return rows
+    return [row.to_dict() for row in rows]
+
+
+def _get_bins_fefo_ordered(
+    product_code: Optional[str],
+    warehouse: Optional[str],
+    year: Optional[int],
+    limit: int,
+    descending: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Bin rows with stock, ordered by FEFO key and limited in one SQL query.
+    
+    FEFO key = year * 1000 + folio, and both are fixed-width digits in the
+    golden number, so ordering by SUBSTRING(year) then SUBSTRING(folio)
+    matches numeric FEFO order. The golden-number check runs in SQL too,
+    so the LIMIT only counts rows that parse.
+    """
+    from frappe.query_builder.functions import Substring
+    
+    bin_table = frappe.qb.DocType('Bin')
+    direction = frappe.qb.desc if descending else frappe.qb.asc
+    
+    query = (
+        frappe.qb.from_(bin_table)
+        .select(bin_table.item_code, bin_table.warehouse, bin_table.actual_qty)
+        .where(bin_table.actual_qty > 0)
+        .where(bin_table.item_code.regexp(golden_number_regexp(product_code, year)))
+        # ITEM_ppppFFFyyP: year at 13-14, folio at 10-12 (1-based)
+        .orderby(Substring(bin_table.item_code, 13, 2), order=direction)
+        .orderby(Substring(bin_table.item_code, 10, 3), order=direction)
+        .limit(limit)
+    )
+    
+    if warehouse:
+        query = query.where(bin_table.warehouse == warehouse)
+    
+    return query.run(as_dict=True)
 
 
 def get_batch_coa_parameters(batch_name: str) -> Optional[Dict[str, Dict[str, Any]]]:
@@ -417,6 +531,18 @@ def check_tds_compliance(
     return {'all_pass': all_pass, 'parameters': results}
 
 
+def _tds_passes(
+    predicted: List[float],
+    mins: List[Optional[float]],
+    maxs: List[Optional[float]]
+) -> List[bool]:
+    """PASS flags for predicted values against TDS ranges (None = no limit)."""
+    return [
+        (lo is None or v >= lo) and (hi is None or v <= hi)
+        for v, lo, hi in zip(predicted, mins, maxs)
+    ]
+
+
 # ===========================================
 # Formulation Reader Class (Extended)
 # ===========================================
@@ -861,49 +987,57 @@ class FormulationReader:
                     param_values[code].append((value, mass, cunete_id))
         
         # Calculate weighted average for each parameter
-        all_pass = True
+        tds_by_code = {p.parameter_code: p for p in tds_spec.parameters}
+        checked: List[tuple] = []  # (BlendParameterResult, unrounded value) with a TDS limit
         
         for param_code, values in param_values.items():
-            total_weighted = sum(v * m for v, m, _ in values)
-            total_mass = sum(m for _, m, _ in values)
+            if len(values) >= KERNEL_MIN_INPUTS:
+                from raven_ai_agent.skills.formulation_reader.kernels import weighted_sums
+                vals, masses, _ = zip(*values)
+                total_weighted, total_mass = weighted_sums(vals, masses)
+            else:
+                total_weighted = 0.0
+                total_mass = 0.0
+                for v, m, _ in values:
+                    total_weighted += v * m
+                    total_mass += m
             
             if total_mass > 0:
                 predicted_value = total_weighted / total_mass
                 
                 # Find TDS limits
-                tds_param = next(
-                    (p for p in tds_spec.parameters if p.parameter_code == param_code),
-                    None
-                )
-                
+                tds_param = tds_by_code.get(param_code)
                 tds_min = tds_param.min_value if tds_param else None
                 tds_max = tds_param.max_value if tds_param else None
                 
-                # Determine PASS/FAIL
-                param_result = "N/A"
-                if tds_min is not None or tds_max is not None:
-                    passes_min = tds_min is None or predicted_value >= tds_min
-                    passes_max = tds_max is None or predicted_value <= tds_max
-                    param_result = "PASS" if (passes_min and passes_max) else "FAIL"
-                    
-                    if param_result == "FAIL":
-                        all_pass = False
-                
                 # Record weighted inputs for traceability
                 weighted_inputs = [
                     {"cunete_id": cid, "value": v, "mass_kg": m, "contribution": (v * m) / total_weighted if total_weighted else 0}
                     for v, m, cid in values
                 ]
                 
-                result.parameters.append(BlendParameterResult(
+                param_result = BlendParameterResult(
                     parameter_code=param_code,
                     parameter_name=param_code.replace("_", " ").title(),
                     predicted_value=round(predicted_value, 4),
                     tds_min=tds_min,
                     tds_max=tds_max,
-                    result=param_result,
+                    result="N/A",
                     weighted_inputs=weighted_inputs,
-                ))
+                )
+                result.parameters.append(param_result)
+                if tds_min is not None or tds_max is not None:
+                    checked.append((param_result, predicted_value))
+        
+        # Determine PASS/FAIL for every limited parameter in one check
+        passes = _tds_passes(
+            [v for _, v in checked],
+            [p.tds_min for p, _ in checked],
+            [p.tds_max for p, _ in checked],
+        )
+        for (param_result, _), ok in zip(checked, passes):
+            param_result.result = "PASS" if ok else "FAIL"
+        all_pass = all(passes)
         
         result.all_pass = all_pass
         result.summary = self._generate_simulation_summary(result)
@@ -14,9 +14,291 @@ Example queries supported (from spec section 5):
 """
 
 from raven_ai_agent.skills.framework import SkillBase
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from copy import deepcopy
+from string import Template
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 import re
-import json
+
+if TYPE_CHECKING:
+    from raven_ai_agent.skills.formulation_reader.reader import BatchRow
+
+
+# Seconds a conversation-scoped batch list stays in the Redis cache, so a
+# follow-up question ("which ones from 2023?") reuses the previous fetch.
+BATCH_CACHE_TTL = 30
+
+# Above this many batches the summary aggregates are computed with NumPy
+# in a single columnar pass instead of three generator passes.
+NUMPY_SUMMARY_THRESHOLD = 50
+
+# Identical (query, context) pairs answered from the in-process response
+# cache. Entries are keyed on the site and the cache epoch, which Batch and
+# Stock Ledger Entry doc events bump so stock changes are never served stale.
+# Only stock intents are cached: COA/TDS/blend answers read spec doctypes
+# that do not bump the epoch.
+RESPONSE_CACHE_SIZE = 64
+_CACHEABLE_INTENTS = frozenset({"fefo", "batch"})
+_CACHE_EPOCH_KEY = "formulation_reader:cache_epoch"
+_EPOCH_BUMP_QUEUED = "formulation_reader_epoch_bump_queued"  # frappe.flags key
+
+# (site, epoch, query, context items) -> response, least recently used first
+_RESPONSE_CACHE: "OrderedDict[Tuple, Optional[Dict]]" = OrderedDict()
+
+# Context keys that do not change the answer; any other key (user
+# filters, permissions, ...) bypasses the response cache.
+_CACHEABLE_CONTEXT_KEYS = frozenset({"conversation_id", "channel_id"})
+
+
+def _cache_epoch() -> int:
+    """Current response-cache epoch shared by all workers through Redis."""
+    import frappe
+    cache = frappe.cache()
+    return int(cache.get(cache.make_key(_CACHE_EPOCH_KEY)) or 0)
+
+
+def bump_cache_epoch(doc=None, method=None):
+    """
+    Invalidate cached formulation responses once the transaction commits
+    (doc_events hook). Any number of stock writes in one transaction queue
+    a single bump; a rolled back transaction bumps nothing.
+    """
+    import frappe
+    if frappe.flags.get(_EPOCH_BUMP_QUEUED):
+        return
+    frappe.flags[_EPOCH_BUMP_QUEUED] = True
+    frappe.db.after_commit.add(_incr_cache_epoch)
+    frappe.db.after_rollback.add(_clear_epoch_bump)
+
+
+def _incr_cache_epoch():
+    """Atomically advance the site's cache epoch."""
+    import frappe
+    _clear_epoch_bump()
+    cache = frappe.cache()
+    cache.incr(cache.make_key(_CACHE_EPOCH_KEY))
+
+
+def _clear_epoch_bump():
+    import frappe
+    frappe.flags.pop(_EPOCH_BUMP_QUEUED, None)
+
+
+# Per-row template for batch listings, parsed once at import.
+_BATCH_ROW_FMT = (
+    "- **{b.item_code}** (Batch: {batch_label}): "
+    "{b.qty} kg, FEFO Key: {b.fefo_key} (Year: {b.year}, Folio: {b.folio})"
+)
+
+_STATUS_ICON = {"PASS": "✅", "FAIL": "❌"}
+
+
+def _fefo_template(batch_type: str, use: str, key_note: str) -> Template:
+    """Build the FEFO single-batch response template for oldest/newest."""
+    return Template(f"""[FORMULATION_READER RESPONSE]
+
+Query: {batch_type.capitalize()} batch to use {use}
+
+Result:
+- **Item Code**: $item_code
+- **Batch Name**: $batch_label
+- **Quantity Available**: $qty kg
+- **Warehouse**: $warehouse
+- **Year**: $year
+- **Folio**: $folio
+- **FEFO Key**: $fefo_key ({key_note} - ship {use})
+
+Summary:
+- This is the {batch_type} batch and should be shipped {use} per FEFO policy.""")
+
+
+_FEFO_OLDEST_TMPL = _fefo_template("oldest", "first", "lowest")
+_FEFO_NEWEST_TMPL = _fefo_template("newest", "last", "highest")
+
+
+def _summarize_batches(batches: List["BatchRow"]) -> Tuple[float, int, int]:
+    """Return (total_qty, oldest_fefo, newest_fefo) for a non-empty batch list."""
+    if len(batches) <= NUMPY_SUMMARY_THRESHOLD:
+        return (
+            sum(b.qty for b in batches),
+            min(b.fefo_key for b in batches),
+            max(b.fefo_key for b in batches),
+        )
+    
+    import numpy as np
+    count = len(batches)
+    qtys = np.fromiter((b.qty for b in batches), dtype=np.float64, count=count)
+    fefo = np.fromiter((b.fefo_key for b in batches), dtype=np.int64, count=count)
+    return float(qtys.sum()), int(fefo.min()), int(fefo.max())
+
+
+# Slot extraction patterns, in priority order per slot. Each pattern names
+# the captured value ``v``; all of them are fused into _SLOTS_RE below.
+_SLOT_PATTERNS = {
+    "product": [
+        r"product\s+(?P<v>\d{4})",  # "product 0612"
+        r"for\s+(?P<v>\d{4})",  # "for 0612"
+        r"(?P<v>\d{4})\s+batches",  # "0612 batches"
+    ],
+    "year": [
+        r"from\s+(?:20)?(?P<v>\d{2})\b",  # "from 2023" or "from 23"
+        r"(?P<v>20\d{2})\s+.*(?:stock|batch)",  # "2023 stock"
+        r"year\s+(?:20)?(?P<v>\d{2})",  # "year 2023"
+    ],
+    "item": [
+        r"item\s+(?P<v>[A-Z0-9]+-[A-Z0-9]+-[0-9]+-[0-9]+)",  # AL-QX-90-10
+        r"item\s+(?P<v>\d{4}-\d{4})",  # 0227-0303
+        r"item\s+(?P<v>[A-Z0-9-]+)",  # Generic
+        r"for\s+(?P<v>[A-Z0-9]+-[A-Z0-9]+-[0-9]+-[0-9]+)",  # for AL-QX-90-10
+        r"(?P<v>[A-Z]{2}-[A-Z]+-\d+-\d+)",  # AL-QX-90-10 anywhere
+        r"(?P<v>\d{4}-\d{4})",  # 0227-0303 anywhere
+    ],
+    "warehouse": [
+        r"warehouse\s+(?P<v>[A-Za-z0-9-]+)",
+        r"in\s+(?P<v>Almacen[A-Za-z0-9-]*)",
+        r"in\s+(?P<v>WH-[A-Za-z0-9-]+)",
+        r"from\s+(?P<v>Almacen[A-Za-z0-9-]*)",
+        r"in\s+(?P<v>FG[A-Za-z0-9\s-]+Warehouse[A-Za-z0-9\s-]*)",
+    ],
+    "batch": [
+        r"batch\s+(?P<v>LOTE\d+)",  # LOTE040 format (per spec)
+        r"(?P<v>LOTE\d+)",  # LOTE anywhere
+        r"batch\s+(?P<v>[A-Z0-9-]+AMB[A-Z0-9-]+)",
+        r"batch\s+(?P<v>[A-Z0-9-]{5,})",
+        r"(?P<v>BATCH-AMB-[A-Z0-9-]+)",
+    ],
+    "so": [
+        r"(?P<v>SO-\d+)",
+        r"sales\s+order\s+(?P<v>\w+-?\d+)",
+        r"order\s+(?P<v>SO\d+)",
+    ],
+}
+
+# Every pattern becomes an optional lookahead tried at every position, so
+# one finditer() pass records the leftmost hit of every pattern without
+# one pattern's match consuming text another slot needs.
+_SLOTS_RE = re.compile(
+    "".join(
+        "(?:(?={})|)".format(pattern.replace("(?P<v>", f"(?P<{slot}_{i}>"))
+        for slot, slot_patterns in _SLOT_PATTERNS.items()
+        for i, pattern in enumerate(slot_patterns)
+    ),
+    re.IGNORECASE,
+)
+
+_UPPERCASE_SLOTS = ("item", "batch", "so")
+
+# Blend input pattern: "X kg from BATCH-ID"
+_BLEND_INPUT_RE = re.compile(
+    r'(\d+(?:\.\d+)?)\s*kg\s+(?:from|of)\s+([A-Z0-9-]+)', re.IGNORECASE
+)
+
+# Query-type detector patterns, keyed by intent in routing priority order.
+_INTENT_PATTERNS = {
+    "fefo": [
+        r"oldest\s+batch",
+        r"newest\s+batch",
+        r"(?:first|next)\s+.*ship",
+        r"fefo",
+        r"use\s+first",
+    ],
+    "batch": [
+        r"(?:show|get|list|find)\s+.*batch",
+        r"batch(?:es)?\s+(?:for|in|from)",
+        r"cunete",
+        r"inventory\s+for",
+        r"what\s+batch(?:es)?\s+.*(?:have|available)",
+        r"(?:available|stock)\s+.*batch",
+        r"product\s+\d{4}",  # Product code query
+        r"from\s+(?:20)?\d{2}\s+.*(?:stock|batch)",  # Year query
+    ],
+    "coa": [
+        r"(?:get|show)\s+coa",
+        r"coa\s+(?:for|of|amb|parameter)",
+        r"analytical\s+(?:data|parameters|results)",
+        r"(?:ph|polysaccharides|ash|color)\s+(?:for|of|value)",
+    ],
+    "tds": [
+        r"(?:get|show|what)\s+.*tds",
+        r"tds\s+(?:for|spec|range)",
+        r"specification(?:s)?\s+for",
+        r"(?:min|max|range)\s+.*parameter",
+    ],
+    "blend": [
+        r"simulate\s+(?:a\s+)?blend",
+        r"blend\s+(?:of|with|from)",
+        r"weighted\s+average",
+        r"predict\s+.*parameter",
+        r"\d+\s*kg\s+(?:from|of)",
+    ],
+    # Generic formulation query - provide help
+    "help": [
+        r"formulation",
+        r"help",
+        r"what can",
+    ],
+}
+
+_INTENT_HANDLERS = {
+    "fefo": "_handle_fefo_query",
+    "batch": "_handle_batch_query",
+    "coa": "_handle_coa_query",
+    "tds": "_handle_tds_query",
+    "blend": "_handle_blend_query",
+    "help": "_handle_help_query",
+}
+
+# One anchored match evaluates every intent: each intent is an optional
+# lookahead over the whole query, so the match object records which
+# detectors fired and routing no longer re-runs them one re.search at a time.
+_ROUTER_RE = re.compile(
+    "".join(
+        f"(?:(?=(?s:.*?)(?P<{intent}>{'|'.join(patterns)}))|)"
+        for intent, patterns in _INTENT_PATTERNS.items()
+    )
+)
+
+
+def _route(query_lower: str) -> Optional[str]:
+    """Return the highest-priority intent whose detector matches, if any."""
+    match = _ROUTER_RE.match(query_lower)
+    return next((intent for intent in _INTENT_PATTERNS if match.group(intent) is not None), None)
+
+
+def _extract_slots(query: str) -> Dict[str, Optional[Any]]:
+    """
+    Extract product, year, item, warehouse, batch and sales order in one scan.
+    
+    For each slot the first pattern (in _SLOT_PATTERNS order) that matched
+    anywhere wins, mirroring the previous one-regex-per-pattern helpers.
+    """
+    hits: Dict[str, str] = {}
+    for match in _SLOTS_RE.finditer(query):
+        if match.lastindex is None:
+            continue
+        for name, value in match.groupdict().items():
+            if value is not None and name not in hits:
+                hits[name] = value
+    
+    return {
+        slot: _normalize_slot(slot, next(
+            (hits[f"{slot}_{i}"] for i in range(len(slot_patterns)) if f"{slot}_{i}" in hits),
+            None,
+        ))
+        for slot, slot_patterns in _SLOT_PATTERNS.items()
+    }
+
+
+def _normalize_slot(slot: str, value: Optional[str]) -> Optional[Any]:
+    """Upper-case code slots and expand two-digit years."""
+    if not value:
+        return value
+    if slot in _UPPERCASE_SLOTS:
+        return value.upper()
+    if slot == "year":
+        year = int(value)
+        return 2000 + year if year < 100 else year
+    return value
 
 
 class FormulationReaderSkill(SkillBase):
@@ -85,9 +367,12 @@ class FormulationReaderSkill(SkillBase):
         r"lote\d+",  # LOTE batch format
     ]
     
+    __slots__ = ("_reader", "_batch_cache")
+    
     def __init__(self, agent=None):
         super().__init__(agent)
         self._reader = None
+        self._batch_cache: Dict[Tuple[str, str, int], List["BatchRow"]] = {}
     
     @property
     def reader(self):
@@ -113,30 +398,38 @@ class FormulationReaderSkill(SkillBase):
             Dict with response or None if not handled
         """
         query_lower = query.lower()
+        if not _HANDLE_KEYWORDS_RE.search(query_lower):
+            return None
         
+        import frappe
         try:
-            # Detect query type and route to appropriate handler
-            if self._is_fefo_query(query_lower):
-                return self._handle_fefo_query(query, context)
-            
-            elif self._is_batch_query(query_lower):
-                return self._handle_batch_query(query, context)
-            
-            elif self._is_coa_query(query_lower):
-                return self._handle_coa_query(query, context)
-            
-            elif self._is_tds_query(query_lower):
-                return self._handle_tds_query(query, context)
-            
-            elif self._is_blend_query(query_lower):
-                return self._handle_blend_query(query, context)
+            # Detect query type with one router match; the first intent in
+            # priority order wins
+            intent = _route(query_lower)
+            if not intent:
+                return None
             
-            # Generic formulation query - provide help
-            elif any(t in query_lower for t in ["formulation", "help", "what can"]):
-                return self._handle_help_query(query, context)
+            # Identical stock queries are answered from the response cache
+            # until a stock or Batch change bumps the epoch; other intents
+            # and user-scoped contexts always go to the database
+            if intent not in _CACHEABLE_INTENTS or (
+                context and not context.keys() <= _CACHEABLE_CONTEXT_KEYS
+            ):
+                return self._handle_uncached(query, intent, context)
+            context_key = tuple(sorted(context.items())) if context else ()
+            cache_key = (frappe.local.site, _cache_epoch(), query, context_key)
+            if cache_key in _RESPONSE_CACHE:
+                _RESPONSE_CACHE.move_to_end(cache_key)
+                result = _RESPONSE_CACHE[cache_key]
+            else:
+                # Exceptions propagate before this point, so they are not cached
+                result = _RESPONSE_CACHE[cache_key] = self._handle_uncached(query, intent, context)
+                if len(_RESPONSE_CACHE) > RESPONSE_CACHE_SIZE:
+                    _RESPONSE_CACHE.popitem(last=False)
+            # Callers may mutate the nested data payload
+            return deepcopy(result)
             
         except Exception as e:
-            import frappe
             frappe.log_error(
                 f"Error in FormulationReaderSkill: {str(e)}",
                 "FormulationReaderSkill.handle"
@@ -147,101 +440,87 @@ class FormulationReaderSkill(SkillBase):
                 "confidence": 0.5,
                 "data": {"error": str(e)}
             }
-        
-        return None
+    
+    def _handle_uncached(self, query: str, intent: str, context: Dict = None) -> Optional[Dict]:
+        """Run the intent's handler, reading batches fresh; slots are extracted once."""
+        self._batch_cache = {}
+        handler = getattr(self, _INTENT_HANDLERS[intent])
+        return handler(query, context, slots=_extract_slots(query))
     
     # -------------------------------------------
-    # Query Type Detection
+    # Data Access
     # -------------------------------------------
     
-    def _is_batch_query(self, query: str) -> bool:
-        """Check if query is about batches."""
-        patterns = [
-            r"(show|get|list|find)\s+.*batch",
-            r"batch(es)?\s+(for|in|from)",
-            r"cunete",
-            r"inventory\s+for",
-            r"what\s+batch(es)?\s+.*(have|available)",
-            r"(available|stock)\s+.*batch",
-            r"product\s+\d{4}",  # Product code query
-            r"from\s+(20)?\d{2}\s+.*(stock|batch)",  # Year query
-        ]
-        return any(re.search(p, query) for p in patterns)
-    
-    def _is_fefo_query(self, query: str) -> bool:
-        """Check if query is specifically about FEFO (oldest/newest batch)."""
-        patterns = [
-            r"oldest\s+batch",
-            r"newest\s+batch",
-            r"(first|next)\s+.*ship",
-            r"fefo",
-            r"use\s+first",
-        ]
-        return any(re.search(p, query) for p in patterns)
-    
-    def _is_coa_query(self, query: str) -> bool:
-        """Check if query is about COA."""
-        patterns = [
-            r"(get|show)\s+coa",
-            r"coa\s+(for|of|amb|parameter)",
-            r"analytical\s+(data|parameters|results)",
-            r"(ph|polysaccharides|ash|color)\s+(for|of|value)",
-        ]
-        return any(re.search(p, query) for p in patterns)
-    
-    def _is_tds_query(self, query: str) -> bool:
-        """Check if query is about TDS specifications."""
-        patterns = [
-            r"(get|show|what)\s+.*tds",
-            r"tds\s+(for|spec|range)",
-            r"specification(s)?\s+for",
-            r"(min|max|range)\s+.*parameter",
-        ]
-        return any(re.search(p, query) for p in patterns)
-    
-    def _is_blend_query(self, query: str) -> bool:
-        """Check if query is about blend simulation."""
-        patterns = [
-            r"simulate\s+(a\s+)?blend",
-            r"blend\s+(of|with|from)",
-            r"weighted\s+average",
-            r"predict\s+.*parameter",
-            r"\d+\s*kg\s+(from|of)",
-        ]
-        return any(re.search(p, query) for p in patterns)
+    def _get_batches(self, product_code: Optional[str], warehouse: str,
+                     context: Dict = None, year: Optional[int] = None,
+                     limit: Optional[int] = None, order: str = "fefo_asc") -> List["BatchRow"]:
+        """
+        Fetch available batches once per request (and per conversation).
+        
+        Both the FEFO and batch handlers go through here so a single
+        ``get_available_batches`` call serves the whole request. A limited
+        (e.g. FEFO ``LIMIT 1``) request is answered from an already fetched
+        full list when there is one, otherwise the database orders and
+        limits it. When the context carries a ``conversation_id`` results
+        are also kept in Redis for BATCH_CACHE_TTL seconds to serve
+        multi-turn follow-ups.
+        """
+        full_key = (product_code or "", warehouse or "", year or 0)
+        if full_key in self._batch_cache:
+            batches = self._batch_cache[full_key]
+            if not limit:
+                return batches
+            return (batches[::-1] if order == "fefo_desc" else batches)[:limit]
+        
+        key = full_key + ((limit, order) if limit else ())
+        if key in self._batch_cache:
+            return self._batch_cache[key]
+        
+        conversation_id = (context or {}).get("conversation_id")
+        redis_key = None
+        batches = None
+        if conversation_id:
+            import frappe
+            redis_key = "formulation_reader:batches:{}:{}".format(
+                conversation_id, ":".join(map(str, key))
+            )
+            batches = frappe.cache().get_value(redis_key)
+        
+        if batches is None:
+            from raven_ai_agent.skills.formulation_reader.reader import get_available_batches
+            batches = get_available_batches(
+                product_code=product_code, warehouse=warehouse, year=year,
+                limit=limit, order=order, as_rows=True
+            )
+            if redis_key:
+                frappe.cache().set_value(redis_key, batches, expires_in_sec=BATCH_CACHE_TTL)
+        
+        self._batch_cache[key] = batches
+        return batches
     
     # -------------------------------------------
     # Query Handlers
     # -------------------------------------------
     
-    def _handle_batch_query(self, query: str, context: Dict = None) -> Dict:
+    def _handle_batch_query(self, query: str, context: Dict = None,
+                            slots: Dict = None) -> Dict:
         """
         Handle batch-related queries using spec-aligned functions.
         
         Uses get_available_batches() which queries Bin doctype and sorts by FEFO.
         """
-        from raven_ai_agent.skills.formulation_reader.reader import (
-            get_available_batches, parse_golden_number
-        )
-        
         # Extract product code (4-digit) from query
-        product_code = self._extract_product_code(query)
-        warehouse = self._extract_warehouse(query)
-        year_filter = self._extract_year_filter(query)
+        slots = slots or _extract_slots(query)
+        product_code = slots["product"]
+        warehouse = slots["warehouse"]
+        year_filter = slots["year"]
         
         # Default warehouse per spec
         if not warehouse:
             warehouse = 'FG to Sell Warehouse - AMB-W'
         
-        # Get batches using spec-aligned function
-        batches = get_available_batches(
-            product_code=product_code,
-            warehouse=warehouse
-        )
-        
-        # Filter by year if specified
-        if year_filter:
-            batches = [b for b in batches if b['year'] == year_filter]
+        # Get batches using spec-aligned function (year filtered in SQL)
+        batches = self._get_batches(product_code, warehouse, context, year=year_filter)
         
         if not batches:
             msg = f"No batches found"
@@ -259,35 +538,32 @@ class FormulationReaderSkill(SkillBase):
             }
         
         # Format response per spec section 6
-        total_qty = sum(b['qty'] for b in batches)
-        oldest_fefo = min(b['fefo_key'] for b in batches)
-        newest_fefo = max(b['fefo_key'] for b in batches)
-        
-        response_lines = [
-            "[FORMULATION_READER RESPONSE]\n",
-            f"Query: Available batches" + (f" for product {product_code}" if product_code else "") + (f" from {year_filter}" if year_filter else ""),
-            "\nResults (sorted by FEFO - oldest first):",
-        ]
-        
-        for batch in batches:
-            response_lines.append(
-                f"- **{batch['item_code']}** (Batch: {batch['batch_name'] or 'N/A'}): "
-                f"{batch['qty']} kg, FEFO Key: {batch['fefo_key']} (Year: {batch['year']}, Folio: {batch['folio']})"
-            )
-        
-        response_lines.extend([
-            "\nSummary:",
-            f"- Total batches found: {len(batches)}",
-            f"- Total quantity available: {total_qty} Kg",
-            f"- FEFO range: {oldest_fefo} to {newest_fefo}",
-        ])
+        total_qty, oldest_fefo, newest_fefo = _summarize_batches(batches)
+        
+        header = (
+            "[FORMULATION_READER RESPONSE]\n\n"
+            "Query: Available batches"
+            + (f" for product {product_code}" if product_code else "")
+            + (f" from {year_filter}" if year_filter else "")
+            + "\n\nResults (sorted by FEFO - oldest first):"
+        )
+        rows = (
+            _BATCH_ROW_FMT.format(b=b, batch_label=b.batch_name or 'N/A')
+            for b in batches
+        )
+        footer = (
+            "\nSummary:\n"
+            f"- Total batches found: {len(batches)}\n"
+            f"- Total quantity available: {total_qty} Kg\n"
+            f"- FEFO range: {oldest_fefo} to {newest_fefo}"
+        )
         
         return {
             "handled": True,
-            "response": "\n".join(response_lines),
+            "response": "\n".join((header, *rows, footer)),
             "confidence": 0.95,
             "data": {
-                "batches": batches,
+                "batches": [b.to_dict() for b in batches],
                 "product_code": product_code,
                 "warehouse": warehouse,
                 "total_qty": total_qty,
@@ -295,19 +571,24 @@ class FormulationReaderSkill(SkillBase):
             }
         }
     
-    def _handle_fefo_query(self, query: str, context: Dict = None) -> Dict:
+    def _handle_fefo_query(self, query: str, context: Dict = None,
+                           slots: Dict = None) -> Dict:
         """
         Handle FEFO-specific queries (oldest/newest batch).
         
         Spec example 5.4: "What is the oldest batch we should use first?"
         """
-        from raven_ai_agent.skills.formulation_reader.reader import get_available_batches
-        
-        product_code = self._extract_product_code(query)
-        warehouse = self._extract_warehouse(query) or 'FG to Sell Warehouse - AMB-W'
+        slots = slots or _extract_slots(query)
+        product_code = slots["product"]
+        warehouse = slots["warehouse"] or 'FG to Sell Warehouse - AMB-W'
         
-        # Get batches sorted by FEFO
-        batches = get_available_batches(product_code=product_code, warehouse=warehouse)
+        # Determine if asking for oldest or newest; the database returns
+        # just that batch (LIMIT 1 in FEFO order)
+        is_newest = 'newest' in query.lower()
+        batches = self._get_batches(
+            product_code, warehouse, context,
+            limit=1, order="fefo_desc" if is_newest else "fefo_asc"
+        )
         
         if not batches:
             return {
@@ -317,27 +598,14 @@ class FormulationReaderSkill(SkillBase):
                 "data": {"batches": []}
             }
         
-        # Determine if asking for oldest or newest
-        is_newest = 'newest' in query.lower()
-        target_batch = batches[-1] if is_newest else batches[0]  # Already sorted by FEFO
+        target_batch = batches[0].to_dict()
         
         batch_type = "newest" if is_newest else "oldest"
         
-        response = f"""[FORMULATION_READER RESPONSE]
-
-Query: {batch_type.capitalize()} batch to use {'last' if is_newest else 'first'}
-
-Result:
-- **Item Code**: {target_batch['item_code']}
-- **Batch Name**: {target_batch['batch_name'] or 'N/A'}
-- **Quantity Available**: {target_batch['qty']} kg
-- **Warehouse**: {target_batch['warehouse']}
-- **Year**: {target_batch['year']}
-- **Folio**: {target_batch['folio']}
-- **FEFO Key**: {target_batch['fefo_key']} ({'lowest - ship first' if not is_newest else 'highest - ship last'})
-
-Summary:
-- This is the {batch_type} batch and should be {'shipped first' if not is_newest else 'shipped last'} per FEFO policy."""
+        template = _FEFO_NEWEST_TMPL if is_newest else _FEFO_OLDEST_TMPL
+        response = template.substitute(
+            target_batch, batch_label=target_batch['batch_name'] or 'N/A'
+        )
         
         return {
             "handled": True,
@@ -349,7 +617,8 @@ Summary:
             }
         }
     
-    def _handle_coa_query(self, query: str, context: Dict = None) -> Dict:
+    def _handle_coa_query(self, query: str, context: Dict = None,
+                          slots: Dict = None) -> Dict:
         """
         Handle COA-related queries using spec-aligned function.
         
@@ -359,7 +628,8 @@ Summary:
         from raven_ai_agent.skills.formulation_reader.reader import get_batch_coa_parameters
         
         # Extract batch name from query (supports LOTE format)
-        batch_name = self._extract_batch_name(query)
+        slots = slots or _extract_slots(query)
+        batch_name = slots["batch"]
         
         if not batch_name:
             return {
@@ -380,35 +650,20 @@ Summary:
             }
         
         # Format response per spec section 6
-        response_lines = [
-            "[FORMULATION_READER RESPONSE]\n",
-            f"Query: COA parameters for batch {batch_name}",
-            "\nResults:",
-        ]
-        
-        for param_name, param_data in parameters.items():
-            status_icon = "✅" if param_data['status'] == "PASS" else "❌" if param_data['status'] == "FAIL" else "➖"
-            value_str = f"{param_data['value']}" if param_data['value'] is not None else "N/A"
-            range_str = ""
-            if param_data.get('min') is not None and param_data.get('max') is not None:
-                range_str = f" (Range: {param_data['min']}-{param_data['max']})"
-            elif param_data.get('max') is not None:
-                range_str = f" (Max: {param_data['max']})"
-            elif param_data.get('min') is not None:
-                range_str = f" (Min: {param_data['min']})"
-            
-            response_lines.append(
-                f"- {status_icon} **{param_name}**: {value_str}{range_str} [{param_data['status']}]"
-            )
-        
-        response_lines.extend([
-            "\nSummary:",
-            f"- Total parameters: {len(parameters)}",
-        ])
+        header = (
+            "[FORMULATION_READER RESPONSE]\n\n"
+            f"Query: COA parameters for batch {batch_name}\n"
+            "\nResults:"
+        )
+        rows = (
+            self._format_coa_row(param_name, param_data)
+            for param_name, param_data in parameters.items()
+        )
+        footer = f"\nSummary:\n- Total parameters: {len(parameters)}"
         
         return {
             "handled": True,
-            "response": "\n".join(response_lines),
+            "response": "\n".join((header, *rows, footer)),
             "confidence": 0.95,
             "data": {
                 "parameters": parameters,
@@ -416,11 +671,28 @@ Summary:
             }
         }
     
-    def _handle_tds_query(self, query: str, context: Dict = None) -> Dict:
+    @staticmethod
+    def _format_coa_row(param_name: str, param_data: Dict) -> str:
+        """Format one COA parameter line with status icon and range."""
+        status_icon = _STATUS_ICON.get(param_data['status'], "➖")
+        value_str = f"{param_data['value']}" if param_data['value'] is not None else "N/A"
+        range_str = ""
+        if param_data.get('min') is not None and param_data.get('max') is not None:
+            range_str = f" (Range: {param_data['min']}-{param_data['max']})"
+        elif param_data.get('max') is not None:
+            range_str = f" (Max: {param_data['max']})"
+        elif param_data.get('min') is not None:
+            range_str = f" (Min: {param_data['min']})"
+        
+        return f"- {status_icon} **{param_name}**: {value_str}{range_str} [{param_data['status']}]"
+    
+    def _handle_tds_query(self, query: str, context: Dict = None,
+                          slots: Dict = None) -> Dict:
         """Handle TDS-related queries."""
         # Extract item code and sales order from query
-        item_code = self._extract_item_code(query)
-        so_name = self._extract_sales_order(query)
+        slots = slots or _extract_slots(query)
+        item_code = slots["item"]
+        so_name = slots["so"]
         
         if not item_code:
             return {
@@ -474,11 +746,13 @@ Summary:
             }
         }
     
-    def _handle_blend_query(self, query: str, context: Dict = None) -> Dict:
+    def _handle_blend_query(self, query: str, context: Dict = None,
+                            slots: Dict = None) -> Dict:
         """Handle blend simulation queries."""
         # Extract blend inputs from query
         blend_inputs = self._extract_blend_inputs(query)
-        target_item = self._extract_item_code(query)
+        slots = slots or _extract_slots(query)
+        target_item = slots["item"]
         
         if not blend_inputs:
             return {
@@ -510,7 +784,8 @@ Summary:
             "data": self._simulation_to_dict(result)
         }
     
-    def _handle_help_query(self, query: str, context: Dict = None) -> Dict:
+    def _handle_help_query(self, query: str, context: Dict = None,
+                           slots: Dict = None) -> Dict:
         """Handle help/capability queries."""
         response = """**📊 Formulation Reader - Available Commands:**
 
@@ -547,153 +822,39 @@ All operations are **read-only** and do not modify any ERPNext data."""
     
     def _extract_product_code(self, query: str) -> Optional[str]:
         """Extract 4-digit product code from query (e.g., 0612, 0616)."""
-        patterns = [
-            r'product\s+(\d{4})',  # "product 0612"
-            r'for\s+(\d{4})',  # "for 0612"
-            r'(\d{4})\s+batches',  # "0612 batches"
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                return match.group(1)
-        
-        return None
+        return _extract_slots(query)["product"]
     
     def _extract_year_filter(self, query: str) -> Optional[int]:
         """Extract year filter from query (e.g., 2023, from 23)."""
-        patterns = [
-            r'from\s+(20)?(\d{2})\b',  # "from 2023" or "from 23"
-            r'(20\d{2})\s+.*(stock|batch)',  # "2023 stock"
-            r'year\s+(20)?(\d{2})',  # "year 2023"
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                groups = match.groups()
-                # Handle both 2023 and 23 formats
-                if groups[-1]:
-                    year = int(groups[-1])
-                    return 2000 + year if year < 100 else year
-        
-        return None
+        return _extract_slots(query)["year"]
     
     def _extract_item_code(self, query: str) -> Optional[str]:
         """Extract item code from query (for TDS and blend queries)."""
-        patterns = [
-            r'item\s+([A-Z0-9]+-[A-Z0-9]+-[0-9]+-[0-9]+)',  # AL-QX-90-10
-            r'item\s+(\d{4}-\d{4})',  # 0227-0303
-            r'item\s+([A-Z0-9-]+)',  # Generic
-            r'for\s+([A-Z0-9]+-[A-Z0-9]+-[0-9]+-[0-9]+)',  # for AL-QX-90-10
-            r'([A-Z]{2}-[A-Z]+-\d+-\d+)',  # AL-QX-90-10 anywhere
-            r'(\d{4}-\d{4})',  # 0227-0303 anywhere
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                return match.group(1).upper()
-        
-        return None
+        return _extract_slots(query)["item"]
     
     def _extract_warehouse(self, query: str) -> Optional[str]:
         """Extract warehouse from query."""
-        patterns = [
-            r'warehouse\s+([A-Za-z0-9-]+)',
-            r'in\s+(Almacen[A-Za-z0-9-]*)',
-            r'in\s+(WH-[A-Za-z0-9-]+)',
-            r'from\s+(Almacen[A-Za-z0-9-]*)',
-            r'in\s+(FG[A-Za-z0-9\s-]+Warehouse[A-Za-z0-9\s-]*)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                return match.group(1)
-        
-        return None
+        return _extract_slots(query)["warehouse"]
     
     def _extract_batch_name(self, query: str) -> Optional[str]:
         """Extract batch name from query (supports LOTE format per spec)."""
-        patterns = [
-            r'batch\s+(LOTE\d+)',  # LOTE040 format (per spec)
-            r'(LOTE\d+)',  # LOTE anywhere
-            r'batch\s+([A-Z0-9-]+AMB[A-Z0-9-]+)',
-            r'batch\s+([A-Z0-9-]{5,})',
-            r'(BATCH-AMB-[A-Z0-9-]+)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                return match.group(1).upper()
-        
-        return None
+        return _extract_slots(query)["batch"]
     
     def _extract_sales_order(self, query: str) -> Optional[str]:
         """Extract sales order name from query."""
-        patterns = [
-            r'(SO-\d+)',
-            r'sales\s+order\s+(\w+-?\d+)',
-            r'order\s+(SO\d+)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                return match.group(1).upper()
-        
-        return None
+        return _extract_slots(query)["so"]
     
     def _extract_blend_inputs(self, query: str) -> List[Dict]:
         """Extract blend inputs (cunete_id, mass_kg) from query."""
-        inputs = []
-        
-        # Pattern: "X kg from BATCH-ID"
-        pattern = r'(\d+(?:\.\d+)?)\s*kg\s+(?:from|of)\s+([A-Z0-9-]+)'
-        matches = re.findall(pattern, query, re.IGNORECASE)
-        
-        for mass, cunete_id in matches:
-            inputs.append({
-                "cunete_id": cunete_id.upper(),
-                "mass_kg": float(mass)
-            })
-        
-        return inputs
+        return [
+            {"cunete_id": cunete_id.upper(), "mass_kg": float(mass)}
+            for mass, cunete_id in _BLEND_INPUT_RE.findall(query)
+        ]
     
     # -------------------------------------------
     # Serialization Helpers
     # -------------------------------------------
     
-    def _batch_to_dict(self, batch) -> Dict:
-        """Convert BatchAMBRecord to dict."""
-        return {
-            "name": batch.name,
-            "product": batch.product,
-            "subproduct": batch.subproduct,
-            "lot": batch.lot,
-            "sublot": batch.sublot,
-            "kilos": batch.kilos,
-            "brix": batch.brix,
-            "total_solids": batch.total_solids,
-            "manufacturing_date": batch.manufacturing_date,
-            "warehouse": batch.warehouse,
-            "cunete_count": len(batch.cunetes),
-        }
-    
-    def _param_to_dict(self, param) -> Dict:
-        """Convert COAParameter to dict."""
-        return {
-            "parameter_code": param.parameter_code,
-            "parameter_name": param.parameter_name,
-            "measured_value": param.measured_value,
-            "average": param.average,
-            "min_value": param.min_value,
-            "max_value": param.max_value,
-            "result": param.result,
-        }
-    
     def _tds_to_dict(self, tds) -> Dict:
         """Convert TDSSpec to dict."""
         return {
@@ -735,5 +896,17 @@ All operations are **read-only** and do not modify any ERPNext data."""
         }
 
 
+# Every detector routed by handle() needs at least one of these substrings,
+# so a query containing none of them is rejected with a single scan before
+# any of the detector regexes run.
+_HANDLE_KEYWORDS = frozenset(FormulationReaderSkill.triggers) | {
+    "newest", "ship", "first", "inventory", "specification", "parameter",
+    "color", "predict", "kg", "help", "what can",
+}
+_HANDLE_KEYWORDS_RE = re.compile(
+    "|".join(map(re.escape, sorted(_HANDLE_KEYWORDS, key=len, reverse=True)))
+)
+
+
 # Export for auto-discovery
 SKILL_CLASS = FormulationReaderSkill
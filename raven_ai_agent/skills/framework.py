@@ -20,17 +20,57 @@ import os
 import re
 import json
 import importlib
-import pkgutil
+import threading
+from functools import lru_cache
 from abc import ABC, abstractmethod
+from array import array
 from typing import Dict, List, Optional, Tuple, Callable
 from datetime import datetime
 from pathlib import Path
+from types import MappingProxyType
 
 
 # ===========================================
 # Skill Base Class
 # ===========================================
 
+def _union_pattern(patterns) -> Optional["re.Pattern"]:
+    """
+    Compile a skill's patterns into one alternation so can_handle() runs a
+    single search.
+    
+    Patterns that cannot share one regex (numbered backreferences would
+    point at another pattern's group; repeated group names and inline
+    global flags fail to compile) are searched one by one instead.
+    """
+    if not patterns:
+        return None
+    if len(patterns) == 1:
+        return re.compile(patterns[0], re.IGNORECASE)
+    if not any(re.search(r"\\[1-9]", p) for p in patterns):
+        try:
+            return re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE)
+        except re.error:
+            pass
+    return _AnyPattern([re.compile(p, re.IGNORECASE) for p in patterns])
+
+
+class _AnyPattern:
+    """search() over several compiled patterns, for ones that cannot be unioned"""
+    
+    __slots__ = ("patterns",)
+    
+    def __init__(self, patterns):
+        self.patterns = patterns
+    
+    def search(self, text: str):
+        for pattern in self.patterns:
+            match = pattern.search(text)
+            if match:
+                return match
+        return None
+
+
 class SkillBase(ABC):
     """
     Abstract base class for all skills.
@@ -52,6 +92,10 @@ class SkillBase(ABC):
     patterns: List[str] = []  # Regex patterns
     priority: int = 50  # 0-100, higher = checked first
     
+    # Per-instance state only. Subclasses that declare their own __slots__
+    # get dict-free instances; subclasses that don't keep a __dict__ as before.
+    __slots__ = ("agent", "_usage_count", "_success_count")
+    
     def __init__(self, agent=None):
         """Initialize skill with optional agent reference"""
         self.agent = agent
@@ -79,30 +123,55 @@ class SkillBase(ABC):
         """
         pass
     
-    def can_handle(self, query: str) -> Tuple[bool, float]:
+    def can_handle(self, query: str, query_lower: str = None) -> Tuple[bool, float]:
         """
         Check if this skill can handle the query.
         
+        Args:
+            query: The user's query
+            query_lower: query.lower(), when the caller already has it
+        
         Returns:
             (can_handle: bool, confidence: float)
         """
-        query_lower = query.lower()
+        if query_lower is None:
+            query_lower = query.lower()
         
         # R3: return the BEST score, not the first hit. Previously a broad
         # trigger (0.8) returned before precise patterns (0.9) were checked,
         # so e.g. data-quality-scanner's "validate SO-…" pattern could never
         # outrank its own bare "validate" trigger in dispatcher ranking.
         best = 0.0
-        for trigger in self.triggers:
-            if trigger.lower() in query_lower:
+        triggers_lower, pattern_re = self._get_matchers()
+        for trigger in triggers_lower:
+            if trigger in query_lower:
                 best = 0.8
                 break
-        for pattern in self.patterns:
-            if re.search(pattern, query_lower, re.IGNORECASE):
-                best = max(best, 0.9)
-                break
+        if pattern_re is not None and pattern_re.search(query_lower):
+            best = 0.9
         return (best > 0.0), best
     
+    @classmethod
+    def _get_matchers(cls) -> Tuple[Tuple[str, ...], Optional["re.Pattern"]]:
+        """
+        Lowercased triggers and the patterns as one union regex (None when
+        there are no patterns) for can_handle().
+        
+        Built once per class and cached against the trigger/pattern lists
+        they came from, so registry metadata overrides are picked up.
+        """
+        source = (tuple(cls.triggers), tuple(cls.patterns))
+        cached = cls.__dict__.get("_matchers")
+        if cached is not None and cached[0] == source:
+            return cached[1]
+        
+        matchers = (
+            tuple(t.lower() for t in source[0]),
+            _union_pattern(source[1]),
+        )
+        cls._matchers = (source, matchers)
+        return matchers
+    
     def get_help(self) -> str:
         """Return help text for this skill"""
         return f"**{self.emoji} {self.name}**: {self.description}"
@@ -125,6 +194,10 @@ class SkillBase(ABC):
 # Skill Registry
 # ===========================================
 
+_SKILL_MD_CHUNK = 4096  # SKILL.md is read in chunks until the frontmatter closes
+_CANDIDATE_CACHE_SIZE = 1024  # queries whose can_handle() results the registry keeps
+
+
 class SkillRegistry:
     """
     Manages skill discovery and registration.
@@ -136,20 +209,23 @@ class SkillRegistry:
     """
     
     _instance = None
+    _lock = threading.Lock()
     _skills: Dict[str, SkillBase] = {}
-    _initialized = False
+    _discovered = False  # set by get_registry() once default discovery ran
+    _snapshot = None  # read-only copy of _skills for get_all(), rebuilt after register()
+    _candidates: Dict[str, Tuple] = {}  # query -> candidates_for() result, cleared by register()
     
     def __new__(cls):
-        """Singleton pattern"""
+        """Singleton pattern (thread-safe)"""
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._skills = {}  # set up once, under the lock
+                    instance._candidates = {}
+                    cls._instance = instance
         return cls._instance
     
-    def __init__(self):
-        if not self._initialized:
-            self._skills = {}
-            self._initialized = True
-    
     def discover_skills(self, skills_path: str = None):
         """
         Auto-discover skills from the skills directory.
@@ -165,25 +241,28 @@ class SkillRegistry:
                 "skills"
             )
         
-        if not os.path.exists(skills_path):
+        # Scan for skill packages without importing them; DirEntry.is_dir()
+        # reuses the directory listing instead of a stat per item
+        try:
+            with os.scandir(skills_path) as it:
+                entries = sorted(
+                    (entry for entry in it
+                     if entry.is_dir() and entry.name.isidentifier() and not entry.name.startswith("_")),
+                    key=lambda entry: entry.name,
+                )
+        except (FileNotFoundError, NotADirectoryError):
             frappe.logger().warning(f"[SkillRegistry] Skills path not found: {skills_path}")
             return
         
-        # Scan for skill directories
-        for item in os.listdir(skills_path):
-            skill_dir = os.path.join(skills_path, item)
-            
-            if not os.path.isdir(skill_dir):
-                continue
-            
-            if item.startswith("_"):
+        for entry in entries:
+            if not os.path.isfile(os.path.join(entry.path, "__init__.py")):
                 continue
             
             # Try to load the skill
             try:
-                self._load_skill_from_dir(item, skill_dir)
+                self._load_skill_from_dir(entry.name, entry.path)
             except Exception as e:
-                frappe.logger().error(f"[SkillRegistry] Failed to load skill '{item}': {e}")
+                frappe.logger().error(f"[SkillRegistry] Failed to load skill '{entry.name}': {e}")
     
     def _load_skill_from_dir(self, skill_name: str, skill_dir: str):
         """Load a skill from its directory"""
@@ -231,16 +310,23 @@ class SkillRegistry:
         """Parse SKILL.md frontmatter"""
         metadata = {}
         
+        # Read only up to the closing "---", not the (long) markdown body
         with open(filepath, 'r') as f:
-            content = f.read()
+            content = f.read(_SKILL_MD_CHUNK)
+            if content.startswith("---"):
+                while content.find("---", 3) == -1:
+                    chunk = f.read(_SKILL_MD_CHUNK)
+                    if not chunk:
+                        break
+                    content += chunk
         
-        # Parse YAML frontmatter
+        # Parse YAML frontmatter (safe loader, libyaml-backed when available)
         if content.startswith("---"):
             parts = content.split("---", 2)
             if len(parts) >= 3:
                 import yaml
                 try:
-                    metadata = yaml.safe_load(parts[1])
+                    metadata = yaml.load(parts[1], Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
                 except:
                     pass
         
@@ -283,6 +369,26 @@ class SkillRegistry:
                 skill_class.triggers = metadata["triggers"]
         
         self._skills[skill_class.name] = skill_class
+        self._entries_changed()
+    
+    def _entries_changed(self):
+        """Drop derived routing state after the skill table changes"""
+        self._snapshot = None
+        self._candidates = {}
+    
+    def candidates_for(self, query: str, get_skill: Callable) -> Tuple[Tuple[str, float, int], ...]:
+        """
+        (skill_name, confidence, priority) for every skill whose can_handle
+        accepts the query; get_skill(name) supplies the instance to ask.
+        
+        Memoized per query until the next register().
+        """
+        candidates = self._candidates.get(query)
+        if candidates is None:
+            if len(self._candidates) >= _CANDIDATE_CACHE_SIZE:
+                self._candidates.clear()
+            candidates = self._candidates[query] = tuple(_scan_candidates(self, query, get_skill))
+        return candidates
     
     def get(self, name: str) -> Optional[type]:
         """Get a skill class by name"""
@@ -290,11 +396,19 @@ class SkillRegistry:
     
     def list_skills(self) -> List[str]:
         """List all registered skill names"""
-        return list(self._skills.keys())
+        return list(self.get_all())
     
     def get_all(self) -> Dict[str, type]:
-        """Get all registered skills"""
-        return self._skills.copy()
+        """
+        Get all registered skills.
+        
+        Returns a read-only snapshot shared between calls until the next
+        register(), so routing does not copy the table per query.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self._snapshot = MappingProxyType(dict(self._skills))
+        return snapshot
     
     def instantiate(self, name: str, agent=None) -> Optional[SkillBase]:
         """Create an instance of a skill"""
@@ -304,6 +418,37 @@ class SkillRegistry:
         return None
 
 
+def _scan_candidates(registry, query: str, get_skill: Callable) -> List[Tuple[str, float, int]]:
+    """Run can_handle() for every registered skill"""
+    found = []
+    query_lower = query.lower()  # shared by every can_handle
+    
+    for name in registry.get_all():
+        skill = get_skill(name)
+        if not skill:
+            continue
+        
+        try:
+            # Overrides keep the one-argument signature
+            if type(skill).can_handle is SkillBase.can_handle:
+                res = skill.can_handle(query, query_lower)
+            else:
+                res = skill.can_handle(query)
+        except Exception as exc:  # noqa: BLE001
+            frappe.logger().warning(f"[SkillRouter] can_handle failed for {name}: {exc}")
+            continue
+        # Contract is Tuple[bool, float]; tolerate skills returning bare bool
+        if isinstance(res, tuple):
+            can_handle, confidence = res
+        else:
+            can_handle, confidence = bool(res), 0.6
+        
+        if can_handle:
+            found.append((name, confidence, skill.priority))
+    
+    return found
+
+
 # ===========================================
 # Skill Router
 # ===========================================
@@ -424,30 +569,22 @@ class SkillRouter:
         matches = []
         disabled = self._disabled_skills()
         
-        for name, skill_class in self.registry.get_all().items():
+        # can_handle() results are memoized on the registry per query until
+        # the next register(); disabled skills and learned boosts stay live
+        if isinstance(self.registry, SkillRegistry):
+            candidates = self.registry.candidates_for(query, self._get_or_create_skill)
+        else:
+            candidates = _scan_candidates(self.registry, query, self._get_or_create_skill)
+        
+        query_lower = query.lower()
+        for name, confidence, priority in candidates:
             if name in disabled:
                 continue
-            skill = self._get_or_create_skill(name)
-            if not skill:
-                continue
+            # Boost confidence based on learning
+            learned_boost = self._learner.get_confidence_boost(query, name, query_lower)
+            final_confidence = min(1.0, confidence + learned_boost)
             
-            try:
-                res = skill.can_handle(query)
-            except Exception as exc:  # noqa: BLE001
-                frappe.logger().warning(f"[SkillRouter] can_handle failed for {name}: {exc}")
-                continue
-            # Contract is Tuple[bool, float]; tolerate skills returning bare bool
-            if isinstance(res, tuple):
-                can_handle, confidence = res
-            else:
-                can_handle, confidence = bool(res), 0.6
-
-            if can_handle:
-                # Boost confidence based on learning
-                learned_boost = self._learner.get_confidence_boost(query, name)
-                final_confidence = min(1.0, confidence + learned_boost)
-                
-                matches.append((name, final_confidence, skill.priority))
+            matches.append((name, final_confidence, priority))
         
         return matches
     
@@ -467,6 +604,14 @@ class SkillRouter:
 # Skill Learner
 # ===========================================
 
+# Key action words counted as learnable patterns wherever they appear
+# in the query ("fixing" and "fix:" count as "fix")
+_ACTION_WORDS = (
+    "scan", "fix", "compare", "report", "show", "list",
+    "create", "update", "delete", "migrate", "validate",
+)
+
+
 class SkillLearner:
     """
     Learns from skill usage patterns to improve routing.
@@ -478,78 +623,102 @@ class SkillLearner:
     """
     
     def __init__(self):
-        self._patterns: Dict[str, Dict] = {}  # query_pattern -> {skill: count}
+        # Counters are flat arrays indexed by pattern_id * stride + skill_id,
+        # where stride is the skill-id capacity (doubled as skills appear)
+        self._pattern_ids: Dict[str, int] = {}
+        self._skill_ids: Dict[str, int] = {}
+        self._stride = 4
+        self._success = array("q")
+        self._fail = array("q")
         self._cache_file = None
     
+    def _index(self, pattern: str, skill: str) -> int:
+        """Counter slot for (pattern, skill), allocating ids as needed"""
+        skill_id = self._skill_ids.get(skill)
+        if skill_id is None:
+            skill_id = self._skill_ids[skill] = len(self._skill_ids)
+            if skill_id >= self._stride:
+                self._restride(self._stride * 2)
+        
+        pattern_id = self._pattern_ids.get(pattern)
+        if pattern_id is None:
+            pattern_id = self._pattern_ids[pattern] = len(self._pattern_ids)
+            row = [0] * self._stride
+            self._success.extend(row)
+            self._fail.extend(row)
+        return pattern_id * self._stride + skill_id
+    
+    def _restride(self, stride: int):
+        """Re-lay the counter rows out with room for more skills"""
+        pad = [0] * (stride - self._stride)
+        for name in ("_success", "_fail"):
+            old, new = getattr(self, name), array("q")
+            for row in range(len(self._pattern_ids)):
+                new.extend(old[row * self._stride:(row + 1) * self._stride])
+                new.extend(pad)
+            setattr(self, name, new)
+        self._stride = stride
+    
     def record_match(self, query: str, skill: str, success: bool = True):
         """Record a query-skill match"""
         # Extract key patterns from query
-        patterns = self._extract_patterns(query)
-        
-        for pattern in patterns:
-            if pattern not in self._patterns:
-                self._patterns[pattern] = {}
-            
-            if skill not in self._patterns[pattern]:
-                self._patterns[pattern][skill] = {"success": 0, "fail": 0}
-            
-            if success:
-                self._patterns[pattern][skill]["success"] += 1
-            else:
-                self._patterns[pattern][skill]["fail"] += 1
+        for pattern in self._extract_patterns(query.lower()):
+            index = self._index(pattern, skill)  # may re-lay out the arrays
+            counters = self._success if success else self._fail
+            counters[index] += 1
         
         # Persist periodically
         self._maybe_persist()
     
-    def get_confidence_boost(self, query: str, skill: str) -> float:
+    def get_confidence_boost(self, query: str, skill: str, query_lower: str = None) -> float:
         """
         Get confidence boost based on learning.
         
+        Pass query_lower when the caller already lowercased the query.
+        
         Returns 0.0 to 0.2 boost based on past success
         """
-        patterns = self._extract_patterns(query)
+        skill_id = self._skill_ids.get(skill)
+        if skill_id is None:
+            return 0.0
+        
         total_score = 0.0
         pattern_count = 0
-        
-        for pattern in patterns:
-            if pattern in self._patterns:
-                skill_stats = self._patterns[pattern].get(skill, {})
-                success = skill_stats.get("success", 0)
-                fail = skill_stats.get("fail", 0)
-                total = success + fail
-                
-                if total > 0:
-                    pattern_count += 1
-                    total_score += (success / total) * 0.2
+        for pattern in self._extract_patterns(query.lower() if query_lower is None else query_lower):
+            pattern_id = self._pattern_ids.get(pattern)
+            if pattern_id is None:
+                continue
+            index = pattern_id * self._stride + skill_id
+            success = self._success[index]
+            total = success + self._fail[index]
+            
+            if total > 0:
+                pattern_count += 1
+                total_score += (success / total) * 0.2
         
         if pattern_count > 0:
             return total_score / pattern_count
         
         return 0.0
     
-    def _extract_patterns(self, query: str) -> List[str]:
-        """Extract learnable patterns from a query"""
-        patterns = []
-        query_lower = query.lower()
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _extract_patterns(query: str) -> Tuple[str, ...]:
+        """
+        Extract learnable patterns from a query (memoized per query).
         
-        # Extract 2-grams and 3-grams
+        Callers pass the lowercased query so case variants share a cache
+        entry; lower() here only runs on a cache miss.
+        """
+        query_lower = query.lower()
         words = query_lower.split()
         
-        for i in range(len(words) - 1):
-            patterns.append(" ".join(words[i:i+2]))
-        
-        for i in range(len(words) - 2):
-            patterns.append(" ".join(words[i:i+3]))
-        
-        # Extract key action words
-        action_words = ["scan", "fix", "compare", "report", "show", "list", 
-                       "create", "update", "delete", "migrate", "validate"]
-        
-        for word in action_words:
-            if word in query_lower:
-                patterns.append(word)
-        
-        return patterns
+        # 2-grams, 3-grams, then key action words
+        return (
+            *[f"{words[i]} {words[i+1]}" for i in range(len(words) - 1)],
+            *[f"{words[i]} {words[i+1]} {words[i+2]}" for i in range(len(words) - 2)],
+            *[word for word in _ACTION_WORDS if word in query_lower],
+        )
     
     def _maybe_persist(self):
         """Persist learning data periodically"""
@@ -572,8 +741,13 @@ class SkillLearner:
 def get_registry() -> SkillRegistry:
     """Get the global skill registry"""
     registry = SkillRegistry()
-    if not registry._skills:
-        registry.discover_skills()
+    if not registry._discovered:
+        # Other threads wait rather than route against a half-filled table
+        with SkillRegistry._lock:
+            if not registry._discovered:
+                if not registry._skills:
+                    registry.discover_skills()
+                registry._discovered = True
     return registry
 
 
@@ -2,10 +2,13 @@
 IoT Humidity Skill - Dedicated humidity sensor handler for RPi bots.
 Delegates to IoTSensorManagerSkill for unified sensor management.
 """
-import frappe
 from typing import Dict, Optional
 from raven_ai_agent.skills.framework import SkillBase
-from raven_ai_agent.skills.iot_sensor_manager.skill import IoTSensorManagerSkill
+from raven_ai_agent.skills.iot_sensor_manager.skill import IoTSensorManagerSkill, keyword_scanner
+
+_HISTORY_WORDS = frozenset({"history", "historial", "trend", "last"})
+_ALERT_WORDS = frozenset({"alert", "alerta", "warning"})
+_scan_keywords = keyword_scanner(_HISTORY_WORDS, _ALERT_WORDS)
 
 
 class IoTHumiditySkill(SkillBase):
@@ -28,18 +31,28 @@ class IoTHumiditySkill(SkillBase):
         r"(?:humidity|humedad).*(?:l\d{1,2}|bot)",
     ]
 
+    _manager = None
+
+    @property
+    def manager(self) -> IoTSensorManagerSkill:
+        """Sensor manager this skill delegates to, created on first use."""
+        if self._manager is None:
+            self._manager = IoTSensorManagerSkill(agent=self.agent)
+        return self._manager
+
     def handle(self, query: str, context: Dict = None) -> Optional[Dict]:
         """Handle humidity-specific queries."""
-        manager = IoTSensorManagerSkill(agent=self.agent)
+        manager = self.manager
         query_lower = query.lower()
         bot_id = manager._extract_bot_id(query_lower)
 
-        if any(w in query_lower for w in ["history", "historial", "trend", "last"]):
-            return manager._handle_history(bot_id, "humidity " + query_lower, context)
-        elif any(w in query_lower for w in ["alert", "alerta", "warning"]):
+        hits = _scan_keywords(query_lower)
+        if hits & _HISTORY_WORDS:
+            return manager._handle_history(bot_id, query_lower, context, implied_type="humidity")
+        elif hits & _ALERT_WORDS:
             return manager._handle_alerts(bot_id, context)
         else:
-            return manager._handle_read(bot_id, "humidity " + query_lower, context)
+            return manager._handle_read(bot_id, query_lower, context, implied_type="humidity")
 
 
 SKILL_CLASS = IoTHumiditySkill
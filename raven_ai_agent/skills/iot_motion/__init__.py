@@ -2,10 +2,12 @@
 IoT Motion Skill - Dedicated motion/PIR sensor handler for RPi bots.
 Delegates to IoTSensorManagerSkill for unified sensor management.
 """
-import frappe
 from typing import Dict, Optional
 from raven_ai_agent.skills.framework import SkillBase
-from raven_ai_agent.skills.iot_sensor_manager.skill import IoTSensorManagerSkill
+from raven_ai_agent.skills.iot_sensor_manager.skill import IoTSensorManagerSkill, keyword_scanner
+
+_HISTORY_WORDS = frozenset({"history", "historial", "log", "last"})
+_scan_keywords = keyword_scanner(_HISTORY_WORDS)
 
 
 class IoTMotionSkill(SkillBase):
@@ -28,16 +30,26 @@ class IoTMotionSkill(SkillBase):
         r"(?:motion|movement|pir).*(?:l\d{1,2}|bot)",
     ]
 
+    _manager = None
+
+    @property
+    def manager(self) -> IoTSensorManagerSkill:
+        """Sensor manager this skill delegates to, created on first use."""
+        if self._manager is None:
+            self._manager = IoTSensorManagerSkill(agent=self.agent)
+        return self._manager
+
     def handle(self, query: str, context: Dict = None) -> Optional[Dict]:
         """Handle motion-specific queries."""
-        manager = IoTSensorManagerSkill(agent=self.agent)
+        manager = self.manager
         query_lower = query.lower()
         bot_id = manager._extract_bot_id(query_lower)
 
-        if any(w in query_lower for w in ["history", "historial", "log", "last"]):
-            return manager._handle_history(bot_id, "motion " + query_lower, context)
+        hits = _scan_keywords(query_lower)
+        if hits & _HISTORY_WORDS:
+            return manager._handle_history(bot_id, query_lower, context, implied_type="motion")
         else:
-            return manager._handle_read(bot_id, "motion " + query_lower, context)
+            return manager._handle_read(bot_id, query_lower, context, implied_type="motion")
 
 
 SKILL_CLASS = IoTMotionSkill
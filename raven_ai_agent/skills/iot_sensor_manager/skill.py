@@ -6,6 +6,8 @@ Handles temperature, humidity, motion, and general sensor queries.
 Logs readings to ERPNext via IoT Sensor Reading DocType.
 """
 import frappe
+import re
+import time
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 from raven_ai_agent.skills.framework import SkillBase
@@ -50,6 +52,38 @@ SENSOR_TYPES = {
 }
 
 
+# Iteration order for status/alert overviews, fixed at import
+_SENSOR_ITEMS = tuple(SENSOR_TYPES.items())
+
+
+# (critical_low, low, high, critical_high) per sensor type with thresholds;
+# a missing bound never trips
+_THRESHOLD_TABLE = {
+    stype: (
+        cfg["thresholds"].get("critical_low", float("-inf")),
+        cfg["thresholds"].get("low", float("-inf")),
+        cfg["thresholds"].get("high", float("inf")),
+        cfg["thresholds"].get("critical_high", float("inf")),
+    )
+    for stype, cfg in SENSOR_TYPES.items()
+    if cfg["thresholds"]
+}
+
+
+def _threshold_label(bounds: tuple, value: float) -> str:
+    """Alert label for value against one _THRESHOLD_TABLE entry."""
+    critical_low, low, high, critical_high = bounds
+    if value <= critical_low:
+        return "🔴 CRITICAL LOW"
+    elif value >= critical_high:
+        return "🔴 CRITICAL HIGH"
+    elif value <= low:
+        return "🟡 Low Warning"
+    elif value >= high:
+        return "🟡 High Warning"
+    return "✅ Normal"
+
+
 # --- Ingestion-schema mapping -------------------------------------------------
 # The skill speaks in logical sensor types (temperature/humidity/soil/...), but
 # readings are stored in the `IoT Sensor Reading` DocType by the RPi ingestion
@@ -61,6 +95,138 @@ STORED_SCHEMA = {
     "humidity":    {"sensor_types": ["DHT11"],                      "value_field": "humidity"},
     "soil":        {"sensor_types": ["Soil Moisture"],             "value_field": "soil_moisture"},
 }
+# Logical types the default bulk query covers, in SENSOR_TYPES order
+_STORED_SENSOR_TYPES = tuple(t for t in SENSOR_TYPES if t in STORED_SCHEMA)
+
+# Rows fetched per logical type by the bulk latest-reading query; a type
+# crowded out of that window by chattier sensors gets its own query.
+BULK_ROWS_PER_TYPE = 8
+
+# Bot ID in a lowercased query ("l1", "l01" -> L01)
+_BOT_ID_RE = re.compile(r'l(\d{1,2})')
+
+
+def keyword_scanner(*word_sets):
+    """Build a one-pass substring scan over every word in word_sets.
+
+    The returned function gives the set of words found anywhere in a
+    lowercased query -- the same answer as `w in query` per word -- so each
+    intent check in handle() becomes a frozenset intersection.
+    """
+    words = sorted(set().union(*word_sets), key=len, reverse=True)
+    # Zero-width lookahead: findall tries every position, so overlapping
+    # and nested words are all seen
+    pattern = re.compile("(?=(" + "|".join(map(re.escape, words)) + "))")
+    # At one position only the longest word is captured; add its prefixes
+    prefixes = {w: frozenset(p for p in words if w.startswith(p)) for w in words}
+
+    def scan(query_lower: str) -> set:
+        hits = set()
+        for word in pattern.findall(query_lower):
+            hits |= prefixes[word]
+        return hits
+
+    return scan
+
+
+# Intent keywords for handle(), checked in this order
+_STATUS_WORDS = frozenset({"status", "estado", "report", "reporte", "all sensor"})
+_ALERT_WORDS = frozenset({"alert", "alerta", "warning", "critical"})
+_HISTORY_WORDS = frozenset({"history", "historial", "trend", "last"})
+_READ_WORDS = frozenset({"read", "leer", "check", "get", "medir"})
+_scan_keywords = keyword_scanner(_STATUS_WORDS, _ALERT_WORDS, _HISTORY_WORDS, _READ_WORDS)
+# (keywords, handler name, handler takes the query); first match wins
+_ROUTES = (
+    (_STATUS_WORDS, "_handle_status", False),
+    (_ALERT_WORDS, "_handle_alerts", False),
+    (_HISTORY_WORDS, "_handle_history", True),
+    (_READ_WORDS, "_handle_read", True),
+)
+
+# Sensor-type keywords for _detect_sensor_type, checked in this order
+_SENSOR_WORDS = (
+    ("soil", frozenset({"soil", "suelo", "soil moisture"})),
+    ("temperature", frozenset({"temperature", "temp", "temperatura", "calor", "frio"})),
+    ("humidity", frozenset({"humidity", "humid", "humedad"})),
+    ("motion", frozenset({"motion", "movement", "movimiento", "pir", "presence"})),
+    ("light", frozenset({"light", "lux", "luminosity", "luz", "brightness"})),
+)
+_scan_sensor_words = keyword_scanner(*(words for _, words in _SENSOR_WORDS))
+
+
+# History query per value column, built with frappe.qb on first use and
+# reused: pypika builders return a copy from each .where()/.limit(), so the
+# cached base query is never mutated. Only the bot, types and limit vary.
+_HISTORY_QUERIES: Dict[str, tuple] = {}  # value_field -> (table, base query)
+
+
+def _history_rows(stored: Dict, bot_id: str, limit: int) -> List[Dict]:
+    """Newest-first `value`/`timestamp` rows for one stored sensor schema."""
+    value_field = stored["value_field"]
+    entry = _HISTORY_QUERIES.get(value_field)
+    if entry is None:
+        table = frappe.qb.DocType("IoT Sensor Reading")
+        base = (
+            frappe.qb.from_(table)
+            .select(table[value_field].as_("value"), table.creation.as_("timestamp"))
+            .orderby(table.creation, order=frappe.qb.desc)
+        )
+        entry = _HISTORY_QUERIES[value_field] = (table, base)
+    table, base = entry
+    return (
+        base.where(table.device_name == bot_id)
+        .where(table.sensor_type.isin(stored["sensor_types"]))
+        .limit(limit)
+        .run(as_dict=True)
+    )
+
+
+# "Last check" stamp for status replies, formatted at most once per second
+_TS_CACHE = [0, ""]  # [epoch second, formatted]
+
+
+def _now_str() -> str:
+    t = int(time.time())
+    if _TS_CACHE[0] != t:
+        _TS_CACHE[:] = [t, datetime.fromtimestamp(t).strftime('%Y-%m-%d %H:%M:%S')]
+    return _TS_CACHE[1]
+
+
+# --- Reading cache ----------------------------------------------------------
+# Readings arrive every 10-60 s, so a burst of questions about one bot
+# ("temperature", then "humidity", then "status") is served from memory.
+# Per process: other workers see a new reading within READING_CACHE_TTL.
+READING_CACHE_TTL = 5.0  # seconds
+_READING_CACHE: Dict[tuple, tuple] = {}  # key -> (stored_at, value); key[1] is the bot id
+
+
+def _cache_get(key: tuple):
+    """Cached value for key, or None if missing or older than the TTL."""
+    hit = _READING_CACHE.get(key)
+    if hit is not None and time.monotonic() - hit[0] < READING_CACHE_TTL:
+        return hit[1]
+    return None
+
+
+def _cache_put(key: tuple, value) -> None:
+    _READING_CACHE[key] = (time.monotonic(), value)
+
+
+def invalidate_reading_cache(bot_id: str) -> None:
+    """Drop every cached latest/history lookup for a bot."""
+    for key in [k for k in _READING_CACHE if k[1] == bot_id]:
+        _READING_CACHE.pop(key, None)
+
+
+# --- Bulk writes --------------------------------------------------------------
+# log_readings() writes a batch of readings with one bulk INSERT and one
+# commit. Row names come from the DocType's IOT-SR-#### naming series.
+_NAMING_SERIES = "IOT-SR-.####"
+_WRITE_FIELDS = (
+    "name", "sensor_id", "device_name", "sensor_type",
+    "temperature", "humidity", "soil_moisture", "status", "reading_timestamp",
+    "creation", "modified", "owner", "modified_by",
+)
 
 
 class IoTSensorManagerSkill(SkillBase):
@@ -95,29 +261,27 @@ class IoTSensorManagerSkill(SkillBase):
         bot_id = self._extract_bot_id(query_lower)
 
         # Route to specific handler
-        if any(w in query_lower for w in ["status", "estado", "report", "reporte", "all sensor"]):
-            return self._handle_status(bot_id, context)
-        elif any(w in query_lower for w in ["alert", "alerta", "warning", "critical"]):
-            return self._handle_alerts(bot_id, context)
-        elif any(w in query_lower for w in ["history", "historial", "trend", "last"]):
-            return self._handle_history(bot_id, query_lower, context)
-        elif any(w in query_lower for w in ["read", "leer", "check", "get", "medir"]):
-            return self._handle_read(bot_id, query_lower, context)
-        else:
-            return self._handle_status(bot_id, context)
+        hits = _scan_keywords(query_lower)
+        if hits:
+            for words, handler, takes_query in _ROUTES:
+                if hits & words:
+                    if takes_query:
+                        return getattr(self, handler)(bot_id, query_lower, context)
+                    return getattr(self, handler)(bot_id, context)
+        return self._handle_status(bot_id, context)
 
     def _extract_bot_id(self, query: str) -> str:
         """Extract bot ID (e.g., L01) from query string."""
-        import re
-        match = re.search(r'l(\d{1,2})', query)
+        match = _BOT_ID_RE.search(query)
         if match:
             num = int(match.group(1))
             return f"L{num:02d}"
         return "L01"  # Default to L01 test bot
 
-    def _handle_read(self, bot_id: str, query: str, context: Dict = None) -> Dict:
+    def _handle_read(self, bot_id: str, query: str, context: Dict = None,
+                     implied_type: str = None) -> Dict:
         """Handle a sensor reading request."""
-        sensor_type = self._detect_sensor_type(query)
+        sensor_type = self._detect_sensor_type(query, implied_type)
         reading = self._get_latest_reading(bot_id, sensor_type)
 
         if reading:
@@ -142,9 +306,10 @@ class IoTSensorManagerSkill(SkillBase):
     def _handle_status(self, bot_id: str, context: Dict = None) -> Dict:
         """Handle sensor status overview for a bot."""
         lines = [f"📡 **IoT Sensor Status - {bot_id}**\n"]
+        latest = self._get_latest_readings_bulk(bot_id)
 
-        for sensor_type, cfg in SENSOR_TYPES.items():
-            reading = self._get_latest_reading(bot_id, sensor_type)
+        for sensor_type, cfg in _SENSOR_ITEMS:
+            reading = latest.get(sensor_type)
             emoji = cfg["emoji"]
             if reading:
                 alert = self._check_thresholds(sensor_type, reading.get("value", 0))
@@ -154,14 +319,15 @@ class IoTSensorManagerSkill(SkillBase):
             else:
                 lines.append(f"{emoji} {sensor_type.title()}: -- No data --")
 
-        lines.append(f"\n🕐 Last check: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        lines.append(f"\n🕐 Last check: {_now_str()}")
         return {"handled": True, "response": "\n".join(lines), "confidence": 0.9}
 
     def _handle_alerts(self, bot_id: str, context: Dict = None) -> Dict:
         """Handle alert queries."""
         alerts = []
-        for sensor_type, cfg in SENSOR_TYPES.items():
-            reading = self._get_latest_reading(bot_id, sensor_type)
+        latest = self._get_latest_readings_bulk(bot_id)
+        for sensor_type, cfg in _SENSOR_ITEMS:
+            reading = latest.get(sensor_type)
             if reading:
                 status = self._check_thresholds(sensor_type, reading.get("value", 0))
                 if status != "✅ Normal":
@@ -174,9 +340,10 @@ class IoTSensorManagerSkill(SkillBase):
 
         return {"handled": True, "response": response, "confidence": 0.9}
 
-    def _handle_history(self, bot_id: str, query: str, context: Dict = None) -> Dict:
+    def _handle_history(self, bot_id: str, query: str, context: Dict = None,
+                        implied_type: str = None) -> Dict:
         """Handle sensor history queries."""
-        sensor_type = self._detect_sensor_type(query)
+        sensor_type = self._detect_sensor_type(query, implied_type)
         readings = self._get_reading_history(bot_id, sensor_type, limit=10)
 
         if readings:
@@ -190,62 +357,130 @@ class IoTSensorManagerSkill(SkillBase):
 
         return {"handled": True, "response": response, "confidence": 0.85}
 
-    def _detect_sensor_type(self, query: str) -> str:
-        """Detect which sensor type the query refers to."""
-        mapping = {
-            "soil": ["soil", "suelo", "soil moisture"],
-            "temperature": ["temperature", "temp", "temperatura", "calor", "frio"],
-            "humidity": ["humidity", "humid", "humedad"],
-            "motion": ["motion", "movement", "movimiento", "pir", "presence"],
-            "light": ["light", "lux", "luminosity", "luz", "brightness"],
-        }
-        for stype, keywords in mapping.items():
-            if any(kw in query for kw in keywords):
-                return stype
+    def _detect_sensor_type(self, query: str, implied_type: str = None) -> str:
+        """Detect which sensor type the (lowercased) query refers to.
+
+        implied_type is the type a dedicated skill stands for; it ranks as if
+        one of its keywords were in the query.
+        """
+        hits = _scan_sensor_words(query)
+        if hits or implied_type:
+            for stype, keywords in _SENSOR_WORDS:
+                if stype == implied_type or hits & keywords:
+                    return stype
         return "temperature"  # Default
 
     def _get_latest_reading(self, bot_id: str, sensor_type: str) -> Optional[Dict]:
         """Get the latest sensor reading from ERPNext (IoT Sensor Reading).
 
-        Queries the real ingestion schema: device_name + sensor_type in the
-        stored vocabulary, with the value read from its typed column and aliased
-        back to `value` so the formatting helpers stay unchanged.
+        Single-row frappe.db.get_value lookup on the same schema as
+        _get_latest_readings_bulk, cached under the key a one-type bulk
+        call would use.
         """
         stored = STORED_SCHEMA.get(sensor_type)
         if not stored:
             return None
+        cache_key = ("latest", bot_id, (sensor_type,))
+        latest = _cache_get(cache_key)
+        if latest is None:
+            try:
+                row = frappe.db.get_value(
+                    "IoT Sensor Reading",
+                    {"device_name": bot_id, "sensor_type": ["in", stored["sensor_types"]]},
+                    ["sensor_type", stored["value_field"], "creation"],
+                    as_dict=True,
+                    order_by="creation desc",
+                )
+            except Exception as e:
+                frappe.logger().error(f"[IoTSensorManager] Error fetching reading: {e}")
+                return None
+            latest = {sensor_type: self._as_reading(sensor_type, row, row.get("creation"))} if row else {}
+            _cache_put(cache_key, latest)
+        return latest.get(sensor_type)
+
+    @staticmethod
+    def _as_reading(sensor_type: str, row: Dict, timestamp) -> Dict:
+        """Stored row -> reading dict with the typed value aliased back to `value`."""
+        return {
+            "value": row.get(STORED_SCHEMA[sensor_type]["value_field"]),
+            "sensor_type": row.get("sensor_type"),
+            "timestamp": timestamp,
+            "unit": SENSOR_TYPES.get(sensor_type, {}).get("unit", ""),
+        }
+
+    def _get_latest_readings_bulk(self, bot_id: str, sensor_types: List[str] = None) -> Dict[str, Dict]:
+        """Latest reading per logical sensor type from one IoT Sensor Reading query.
+
+        Queries the real ingestion schema: device_name + sensor_type in the
+        stored vocabulary, newest first, and keeps the first row seen for each
+        logical type with its value read from the typed column and aliased back
+        to `value` so the formatting helpers stay unchanged. A DHT11 row serves
+        both temperature and humidity.
+        """
+        if sensor_types:
+            wanted = tuple(t for t in sensor_types if t in STORED_SCHEMA)
+            if not wanted:
+                return {}
+        else:
+            wanted = _STORED_SENSOR_TYPES
+        cache_key = ("latest", bot_id, wanted)
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            return cached
+        stored_types = list(dict.fromkeys(
+            st for t in wanted for st in STORED_SCHEMA[t]["sensor_types"]
+        ))
+        value_fields = list(dict.fromkeys(STORED_SCHEMA[t]["value_field"] for t in wanted))
+        limit = len(wanted) * BULK_ROWS_PER_TYPE
         try:
-            readings = frappe.get_all(
+            rows = frappe.get_all(
                 "IoT Sensor Reading",
-                filters={"device_name": bot_id, "sensor_type": ["in", stored["sensor_types"]]},
-                fields=[f"{stored['value_field']} as value", "sensor_type", "creation as timestamp"],
+                filters={"device_name": bot_id, "sensor_type": ["in", stored_types]},
+                fields=["sensor_type", *value_fields, "creation as timestamp"],
                 order_by="creation desc",
-                limit=1,
+                limit=limit,
             )
-            if readings:
-                r = readings[0]
-                r["unit"] = SENSOR_TYPES.get(sensor_type, {}).get("unit", "")
-                return r
         except Exception as e:
             frappe.logger().error(f"[IoTSensorManager] Error fetching reading: {e}")
-        return None
+            return {}
+
+        latest = {}
+        pending = list(wanted)
+        for row in rows:
+            for sensor_type in pending:
+                stored = STORED_SCHEMA[sensor_type]
+                if row.get("sensor_type") in stored["sensor_types"]:
+                    latest[sensor_type] = self._as_reading(sensor_type, row, row.get("timestamp"))
+            pending = [t for t in pending if t not in latest]
+            if not pending:
+                break
+
+        # A full window may have crowded out a quieter sensor's last reading.
+        # These stay sequential: frappe.db lives on the request's frappe.local,
+        # so worker threads would have no connection to run them on.
+        if pending and len(wanted) > 1 and len(rows) >= limit:
+            for sensor_type in pending:
+                reading = self._get_latest_reading(bot_id, sensor_type)
+                if reading:
+                    latest[sensor_type] = reading
+        _cache_put(cache_key, latest)
+        return latest
 
     def _get_reading_history(self, bot_id: str, sensor_type: str, limit: int = 10) -> List[Dict]:
         """Get historical sensor readings (IoT Sensor Reading)."""
         stored = STORED_SCHEMA.get(sensor_type)
         if not stored:
             return []
+        cache_key = ("history", bot_id, sensor_type, limit)
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            return cached
         try:
-            rows = frappe.get_all(
-                "IoT Sensor Reading",
-                filters={"device_name": bot_id, "sensor_type": ["in", stored["sensor_types"]]},
-                fields=[f"{stored['value_field']} as value", "creation as timestamp"],
-                order_by="creation desc",
-                limit=limit,
-            )
+            rows = _history_rows(stored, bot_id, limit)
             unit = SENSOR_TYPES.get(sensor_type, {}).get("unit", "")
             for r in rows:
                 r["unit"] = unit
+            _cache_put(cache_key, rows)
             return rows
         except Exception as e:
             frappe.logger().error(f"[IoTSensorManager] Error fetching history: {e}")
@@ -253,21 +488,10 @@ class IoTSensorManagerSkill(SkillBase):
 
     def _check_thresholds(self, sensor_type: str, value: float) -> str:
         """Check if a sensor value is within acceptable thresholds."""
-        cfg = SENSOR_TYPES.get(sensor_type, {})
-        thresholds = cfg.get("thresholds", {})
-
-        if not thresholds:
+        bounds = _THRESHOLD_TABLE.get(sensor_type)
+        if bounds is None:
             return "✅ Normal"
-
-        if value <= thresholds.get("critical_low", float("-inf")):
-            return "🔴 CRITICAL LOW"
-        elif value >= thresholds.get("critical_high", float("inf")):
-            return "🔴 CRITICAL HIGH"
-        elif value <= thresholds.get("low", float("-inf")):
-            return "🟡 Low Warning"
-        elif value >= thresholds.get("high", float("inf")):
-            return "🟡 High Warning"
-        return "✅ Normal"
+        return _threshold_label(bounds, value)
 
     @staticmethod
     def log_reading(bot_id: str, sensor_type: str, value: float, gpio_pin: int = None):
@@ -276,21 +500,52 @@ class IoTSensorManagerSkill(SkillBase):
         NOTE: the live RPi path (sensor_reader_dual.py) posts directly to
         /api/resource/IoT Sensor Reading; this helper is kept aligned to the same
         DocType schema for any in-bench callers.
+
+        Returns the row name, or None if the reading was rejected or not saved.
         """
-        stored = STORED_SCHEMA.get(sensor_type)
-        doctype_sensor_type = stored["sensor_types"][0] if stored else sensor_type
-        value_field = stored["value_field"] if stored else "temperature"
+        return IoTSensorManagerSkill.log_readings([(bot_id, sensor_type, value)])[0]
+
+    @staticmethod
+    def log_readings(readings: List[tuple]) -> List[Optional[str]]:
+        """Log many (bot_id, sensor_type, value) readings with one bulk insert.
+
+        bulk_insert skips the DocType controller, so its autoname and
+        before_insert/validate rules are applied here; the batch is committed
+        once. Returns one row name per reading, None for a rejected reading
+        (or for all of them if the insert fails).
+        """
+        from frappe.model.naming import make_autoname
+
+        now = datetime.now()
+        user = frappe.session.user
+        names: List[Optional[str]] = []
+        rows = []
+        for bot_id, sensor_type, value in readings:
+            stored = STORED_SCHEMA.get(sensor_type)
+            doctype_sensor_type = stored["sensor_types"][0] if stored else sensor_type
+            value_field = stored["value_field"] if stored else "temperature"
+            if value_field == "humidity" and not 0 <= value <= 100:
+                frappe.logger().error(f"[IoTSensorManager] Error logging reading: humidity {value} outside 0-100%")
+                names.append(None)
+                continue
+
+            values = {"temperature": None, "humidity": None, "soil_moisture": None, value_field: value}
+            name = make_autoname(_NAMING_SERIES, "IoT Sensor Reading")
+            rows.append((
+                name, f"{bot_id}-{doctype_sensor_type}", bot_id, doctype_sensor_type,
+                values["temperature"], values["humidity"], values["soil_moisture"], "Active", now,
+                now, now, user, user,
+            ))
+            names.append(name)
+
+        if not rows:
+            return names
         try:
-            doc = frappe.get_doc({
-                "doctype": "IoT Sensor Reading",
-                "device_name": bot_id,
-                "sensor_type": doctype_sensor_type,
-                value_field: value,
-                "timestamp": datetime.now(),
-            })
-            doc.insert(ignore_permissions=True)
+            frappe.db.bulk_insert("IoT Sensor Reading", fields=list(_WRITE_FIELDS), values=rows)
             frappe.db.commit()
-            return doc.name
         except Exception as e:
-            frappe.logger().error(f"[IoTSensorManager] Error logging reading: {e}")
-            return None
+            frappe.logger().error(f"[IoTSensorManager] Error logging {len(rows)} readings: {e}")
+            return [None] * len(names)
+        for bot_id in {row[_WRITE_FIELDS.index("device_name")] for row in rows}:
+            invalidate_reading_cache(bot_id)
+        return names
@@ -32,6 +32,9 @@ class MigrationFixer:
         2025: {"start": "00980", "end": "01160"}
     }
     
+    # file name -> (walk position of its directory, path); set while scan_range runs
+    _json_index = None
+    
     def __init__(self, json_source_path: str = None):
         """
         Initialize the migration fixer
@@ -54,6 +57,15 @@ class MigrationFixer:
             f"folio_{invoice_folio}.json",
         ]
         
+        if self._json_index is not None:
+            # Same pick as the lookups below: earliest directory, then pattern order
+            hits = [(self._json_index[p][0], i, self._json_index[p][1])
+                    for i, p in enumerate(patterns) if p in self._json_index]
+            if not hits:
+                return None
+            with open(min(hits)[2], 'r', encoding='utf-8') as f:
+                return json.load(f)
+        
         for pattern in patterns:
             filepath = os.path.join(self.json_path, pattern)
             if os.path.exists(filepath):
@@ -69,6 +81,15 @@ class MigrationFixer:
         
         return None
     
+    def _index_json_files(self) -> Dict[str, Tuple[int, str]]:
+        """Walk json_path once: first location of every JSON file name"""
+        index = {}
+        for position, (root, dirs, files) in enumerate(os.walk(self.json_path)):
+            for f in files:
+                if f.endswith('.json') and f not in index:
+                    index[f] = (position, os.path.join(root, f))
+        return index
+    
     def list_available_folios(self, year: int = None) -> List[str]:
         """List all available FoxPro JSON folios"""
         folios = []
@@ -289,15 +310,20 @@ class MigrationFixer:
         start_num = int(start_folio)
         end_num = int(end_folio)
         
-        for num in range(start_num, end_num + 1):
-            folio = str(num).zfill(5)
-            
-            validation = self.validate_quotation(folio)
-            results["scanned"] += 1
-            results[validation["status"]] = results.get(validation["status"], 0) + 1
-            
-            if validation["status"] != "ok":
-                results["details"].append(validation)
+        # One directory walk for the whole range instead of one per missing file
+        self._json_index = self._index_json_files()
+        try:
+            for num in range(start_num, end_num + 1):
+                folio = str(num).zfill(5)
+                
+                validation = self.validate_quotation(folio)
+                results["scanned"] += 1
+                results[validation["status"]] = results.get(validation["status"], 0) + 1
+                
+                if validation["status"] != "ok":
+                    results["details"].append(validation)
+        finally:
+            self._json_index = None
         
         return results
     
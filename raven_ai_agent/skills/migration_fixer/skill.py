@@ -28,6 +28,22 @@ from typing import Dict, Optional
 from raven_ai_agent.skills.framework import SkillBase
 from raven_ai_agent.skills.migration_fixer.fixer import MigrationFixer
 
+# v2 command forms, compiled once for handle()
+_HELP_RE = re.compile(r"\bmigrate\s+help\b|\bayuda\s+migraci[oó]n\b")
+_SCAN_FOLIO_RE = re.compile(r"\bmigrate\s+scan\s+folio\s+(\d+)")
+_CENSO_FOLIO_RE = re.compile(r"\bcenso\s+migraci[oó]n\s+folio\s+(\d+)")
+_SCAN_SECTION_RE = re.compile(r"\bmigrate\s+scan\s+(2024|2025)\b")
+_CENSO_SECTION_RE = re.compile(r"\bcenso\s+migraci[oó]n\s+(2024|2025)\b")
+_SCAN_USAGE_RE = re.compile(r"\bmigrate\s+scan\b")
+_FOLIO_COMMAND_RE = re.compile(r"\b(?:migrate|migrar)\s+folio\s+(\d+)")
+# Legacy v1 commands: (phrase anywhere in the query, handler), first match wins
+_LEGACY_ROUTES = (
+    ("scan migration", "_handle_scan"),
+    ("fix folio", "_handle_fix"),
+    ("compare folio", "_handle_compare"),
+    ("migration report", "_handle_report"),
+)
+
 
 class MigrationFixerSkill(SkillBase):
     """FoxPro -> ERPNext migration validation, census, and gated repair."""
@@ -77,33 +93,26 @@ class MigrationFixerSkill(SkillBase):
         ql = q.lower().lstrip("!").strip()
 
         try:
-            if re.search(r"\bmigrate\s+help\b|\bayuda\s+migraci[oó]n\b", ql):
+            if _HELP_RE.search(ql):
                 return self._help()
-            m = re.search(r"\bmigrate\s+scan\s+folio\s+(\d+)", ql) \
-                or re.search(r"\bcenso\s+migraci[oó]n\s+folio\s+(\d+)", ql)
+            m = _SCAN_FOLIO_RE.search(ql) or _CENSO_FOLIO_RE.search(ql)
             if m:
                 return self._scan_folio(int(m.group(1)))
-            m = re.search(r"\bmigrate\s+scan\s+(2024|2025)\b", ql) \
-                or re.search(r"\bcenso\s+migraci[oó]n\s+(2024|2025)\b", ql)
+            m = _SCAN_SECTION_RE.search(ql) or _CENSO_SECTION_RE.search(ql)
             if m:
                 return self._scan_section(int(m.group(1)))
-            if re.search(r"\bmigrate\s+scan\b", ql):
+            if _SCAN_USAGE_RE.search(ql):
                 return self._reply(
                     "📋 Usage: `migrate scan folio <n>` or `migrate scan 2024|2025` "
                     "(read-only census / censo de solo lectura)")
-            m = re.search(r"\b(?:migrate|migrar)\s+folio\s+(\d+)", ql)
+            m = _FOLIO_COMMAND_RE.search(ql)
             if m:
                 return self._folio_command(q, int(m.group(1)))
 
             # ---- legacy v1 handlers (unchanged behavior) ---------------- #
-            if "scan migration" in ql:
-                return self._handle_scan(ql)
-            if "fix folio" in ql:
-                return self._handle_fix(ql)
-            if "compare folio" in ql:
-                return self._handle_compare(ql)
-            if "migration report" in ql:
-                return self._handle_report(ql)
+            for phrase, handler in _LEGACY_ROUTES:
+                if phrase in ql:
+                    return getattr(self, handler)(ql)
         except Exception as exc:  # noqa: BLE001
             import frappe
             frappe.logger().error(f"[migration-fixer] {q[:60]}: {exc}", exc_info=True)
@@ -232,57 +241,73 @@ class MigrationFixerSkill(SkillBase):
     # ---- formatting (v1, kept) ------------------------------------------ #
     def _format_scan_results(self, results: Dict, year: int = None) -> str:
         year_str = f" ({year})" if year else ""
-        output = f"""📊 **Migration Scan Results{year_str}**
-
-| Status | Count |
-|--------|-------|
-| 📋 Scanned | {results['scanned']} |
-| ✅ OK | {results['ok']} |
-| ⚠️ Warnings | {results['warnings']} |
-| ❌ Errors | {results['errors']} |
-| 📭 Missing | {results.get('missing', 0)} |
-"""
-        if results.get("details"):
-            output += "\n**Top Issues:**\n"
-            for d in results["details"][:5]:
-                issues_str = d["issues"][0] if d["issues"] else "Unknown issue"
-                output += f"- `{d['folio']}`: {issues_str}\n"
-            remaining = len(results["details"]) - 5
+        lines = [
+            f"📊 **Migration Scan Results{year_str}**",
+            "",
+            "| Status | Count |",
+            "|--------|-------|",
+            f"| 📋 Scanned | {results['scanned']} |",
+            f"| ✅ OK | {results['ok']} |",
+            f"| ⚠️ Warnings | {results['warnings']} |",
+            f"| ❌ Errors | {results['errors']} |",
+            f"| 📭 Missing | {results.get('missing', 0)} |",
+        ]
+        details = results.get("details")
+        if details:
+            lines += ["", "**Top Issues:**"]
+            lines.extend(
+                f"- `{d['folio']}`: {d['issues'][0] if d['issues'] else 'Unknown issue'}"
+                for d in details[:5]
+            )
+            remaining = len(details) - 5
             if remaining > 0:
-                output += f"\n*...and {remaining} more issues*"
-        return output
+                lines += ["", f"*...and {remaining} more issues*"]
+                return "\n".join(lines)
+        lines.append("")
+        return "\n".join(lines)
 
     def _format_comparison(self, result: Dict) -> str:
         folio = result.get("folio", "Unknown")
-        output = f"📋 **Comparison for Folio {folio}**\n\n"
+        lines = [f"📋 **Comparison for Folio {folio}**", ""]
         if result.get("foxpro"):
             fp = result["foxpro"]
-            output += "**FoxPro Source:**\n"
-            output += f"- Customer: {fp.get('customer', 'N/A')}\n"
-            output += f"- Date: {fp.get('date', 'N/A')}\n"
+            lines += [
+                "**FoxPro Source:**",
+                f"- Customer: {fp.get('customer', 'N/A')}",
+                f"- Date: {fp.get('date', 'N/A')}",
+            ]
             if fp.get("total"):
-                output += f"- Total: ${float(fp['total']):,.2f}\n"
-            output += f"- Lote Real: {fp.get('lote_real', 'N/A')}\n"
-            output += f"- Items: {fp.get('items_count', 0)}\n\n"
+                lines.append(f"- Total: ${float(fp['total']):,.2f}")
+            lines += [
+                f"- Lote Real: {fp.get('lote_real', 'N/A')}",
+                f"- Items: {fp.get('items_count', 0)}",
+                "",
+            ]
         else:
-            output += "**FoxPro:** ❌ Not found\n\n"
+            lines += ["**FoxPro:** ❌ Not found", ""]
         if result.get("erpnext"):
             erp = result["erpnext"]
-            output += f"**ERPNext ({erp.get('name', 'Unknown')}):**\n"
-            output += f"- Customer: {erp.get('customer', 'N/A')}\n"
-            output += f"- Date: {erp.get('date', 'N/A')}\n"
-            output += f"- Total: ${erp.get('total', 0):,.2f}\n"
-            output += f"- Lote Real: {erp.get('lote_real', 'N/A')}\n"
-            output += f"- Items: {erp.get('items_count', 0)}\n\n"
+            lines += [
+                f"**ERPNext ({erp.get('name', 'Unknown')}):**",
+                f"- Customer: {erp.get('customer', 'N/A')}",
+                f"- Date: {erp.get('date', 'N/A')}",
+                f"- Total: ${erp.get('total', 0):,.2f}",
+                f"- Lote Real: {erp.get('lote_real', 'N/A')}",
+                f"- Items: {erp.get('items_count', 0)}",
+                "",
+            ]
         else:
-            output += "**ERPNext:** ❌ Not found\n\n"
+            lines += ["**ERPNext:** ❌ Not found", ""]
         if result.get("differences"):
-            output += "**⚠️ Differences Found:**\n"
-            for d in result["differences"]:
-                output += f"- `{d['field']}`: FoxPro='{d['foxpro']}' vs ERPNext='{d['erpnext']}'\n"
+            lines.append("**⚠️ Differences Found:**")
+            lines.extend(
+                f"- `{d['field']}`: FoxPro='{d['foxpro']}' vs ERPNext='{d['erpnext']}'"
+                for d in result["differences"]
+            )
         else:
-            output += "✅ **No differences found**\n"
-        return output
+            lines.append("✅ **No differences found**")
+        lines.append("")
+        return "\n".join(lines)
 
     # ------------------------------------------------------------------ #
     @staticmethod
@@ -6,7 +6,52 @@ Routes incoming messages to appropriate skills based on triggers and patterns.
 
 import re
 import frappe
-from typing import Dict, List, Optional, Any
+from functools import lru_cache
+from typing import Dict, List, Optional, Any, Tuple
+
+
+@lru_cache(maxsize=None)
+def _compile_patterns(patterns: Tuple[str, ...]) -> Tuple["re.Pattern", ...]:
+    """A skill's patterns compiled with IGNORECASE, shared by every router
+    instance (agent.py builds a fresh router per query)."""
+    return tuple(re.compile(p, re.IGNORECASE) for p in patterns)
+
+
+@lru_cache(maxsize=8)
+def _trigger_index(skill_triggers: Tuple[Tuple[str, Tuple[str, ...]], ...]):
+    """
+    One multi-pattern scanner over every skill's lowercased triggers.
+    
+    Returns (scan, owners): scan(query) gives the set of (lowercased)
+    triggers contained in the query, ignoring case, and owners maps a
+    trigger to the skill names listing it (once per listing). scan is None
+    when no skill has triggers.
+    
+    The scanner is an IGNORECASE zero-width lookahead alternation (longest
+    first) over the query as given, so findall() sees every position and
+    overlapping or nested triggers are all found; a captured trigger also
+    counts the triggers it starts with.
+    """
+    owners: Dict[str, List[str]] = {}
+    for name, triggers in skill_triggers:
+        for trigger in triggers:
+            owners.setdefault(trigger.lower(), []).append(name)
+    if not owners:
+        return None, owners
+    
+    words = sorted(owners, key=len, reverse=True)
+    pattern = re.compile("(?=(" + "|".join(map(re.escape, words)) + "))", re.IGNORECASE)
+    prefixes = {w: tuple(p for p in words if w.startswith(p)) for w in words}
+    
+    def scan(query: str) -> set:
+        found = set()
+        for word in pattern.findall(query):
+            # only the matched slice is lowercased; a case-folding match
+            # that does not lower back to a trigger is not counted
+            found.update(prefixes.get(word.lower(), ()))
+        return found
+    
+    return scan, owners
 
 
 class SkillRouter:
@@ -19,8 +64,47 @@ class SkillRouter:
     
     def __init__(self):
         self.skills: Dict[str, Any] = {}
+        self._priorities: Dict[str, int] = {}
+        self._compiled_patterns: Dict[str, Tuple["re.Pattern", ...]] = {}
         self._load_skills()
     
+    def register_skill(self, skill: Any, name: str = None) -> None:
+        """Add a skill instance and precompile its patterns."""
+        name = name or getattr(skill, "name", type(skill).__name__)
+        self.skills[name] = skill
+        self._priorities[name] = getattr(skill, "priority", 50)
+        self._compiled_patterns[name] = _compile_patterns(tuple(getattr(skill, "patterns", None) or ()))
+    
+    def _patterns_for(self, name: str, skill: Any) -> Tuple["re.Pattern", ...]:
+        compiled = self._compiled_patterns.get(name)
+        if compiled is None:  # added to self.skills directly
+            compiled = _compile_patterns(tuple(getattr(skill, "patterns", None) or ()))
+        return compiled
+    
+    def _priority_for(self, name: str, skill: Any) -> int:
+        priority = self._priorities.get(name)
+        if priority is None:  # added to self.skills directly
+            priority = getattr(skill, "priority", 50)
+        return priority
+    
+    def _get_trigger_index(self):
+        # Keyed on the current trigger lists: shared across router instances
+        # and rebuilt if registry metadata replaces a skill's triggers
+        return _trigger_index(tuple(
+            (name, tuple(skill.triggers)) for name, skill in self.skills.items()
+        ))
+    
+    def _trigger_hits(self, query: str) -> Dict[str, int]:
+        """Triggers contained in the query (any case), counted per skill, in one scan."""
+        scan, owners = self._get_trigger_index()
+        if scan is None:
+            return {}
+        counts: Dict[str, int] = {}
+        for trigger in scan(query):
+            for name in owners[trigger]:
+                counts[name] = counts.get(name, 0) + 1
+        return counts
+    
     def _load_skills(self):
         """R2: load every skill from the framework SkillRegistry — single
         source of truth. The old hardcoded import block silently diverged
@@ -34,7 +118,7 @@ class SkillRouter:
             for name, skill_class in registry.get_all().items():
                 try:
                     skill = skill_class()
-                    self.skills[getattr(skill, "name", name)] = skill
+                    self.register_skill(skill, getattr(skill, "name", name))
                 except Exception as exc:  # noqa: BLE001
                     frappe.logger().warning(
                         f"[SkillRouter] could not instantiate {name}: {exc}"
@@ -54,36 +138,32 @@ class SkillRouter:
             Response dict from the handling skill, or None if no match
         """
         context = context or {}
-        query_lower = query.lower()
         
-        # Find matching skills
-        matches = []
+        # Score matching skills: name -> score
+        scores = {}
+        trigger_hits = self._trigger_hits(query)
         
-        for skill in self.skills.values():
-            score = 0
-            
-            # Check triggers
-            for trigger in skill.triggers:
-                if trigger.lower() in query_lower:
-                    score += 10
+        for name, skill in self.skills.items():
+            # 10 per trigger found in the query
+            score = 10 * trigger_hits.get(name, 0)
             
             # Check patterns
-            if hasattr(skill, 'patterns'):
-                for pattern in skill.patterns:
-                    if re.search(pattern, query, re.IGNORECASE):
-                        score += 20
+            for pattern in self._patterns_for(name, skill):
+                if pattern.search(query):
+                    score += 20
             
             if score > 0:
-                matches.append((skill, score))
+                scores[name] = score
         
-        if not matches:
+        if not scores:
             return None
         
-        # Sort by score (and priority as tiebreaker)
-        matches.sort(key=lambda x: (x[1], getattr(x[0], 'priority', 50)), reverse=True)
+        # Best match: highest score, then priority, then registration order
+        # (max() keeps the first)
+        best = max(scores, key=lambda n: (scores[n], self._priority_for(n, self.skills[n])))
         
         # Execute best match
-        best_skill = matches[0][0]
+        best_skill = self.skills[best]
         frappe.logger().info(f"[SkillRouter] Calling skill: {best_skill.name}")
         try:
             result = best_skill.handle(query, context)
@@ -97,16 +177,13 @@ class SkillRouter:
     
     def can_handle(self, query: str) -> bool:
         """Check if any skill can handle this query."""
-        query_lower = query.lower()
+        scan = self._get_trigger_index()[0]
+        if scan is not None and scan(query):
+            return True
         
-        for skill in self.skills.values():
-            for trigger in skill.triggers:
-                if trigger.lower() in query_lower:
+        for name, skill in self.skills.items():
+            for pattern in self._patterns_for(name, skill):
+                if pattern.search(query):
                     return True
-            
-            if hasattr(skill, 'patterns'):
-                for pattern in skill.patterns:
-                    if re.search(pattern, query, re.IGNORECASE):
-                        return True
         
         return False
@@ -1,9 +1,12 @@
 """Skill Creator - Meta-skill for creating new skills."""
 import os
 import re
+from functools import lru_cache
 from pathlib import Path
 from ..framework import SkillBase
 
+_SKILL_NAME_RE = re.compile(r'(?:create|new|add|generate)\s+skill\s+["\']?(\w+)["\']?', re.I)
+
 SKILL_TEMPLATE = '''---
 name: {name}
 description: {description}
@@ -65,6 +68,41 @@ __all__ = ["{class_name}"]
 '''
 
 
+@lru_cache(maxsize=64)
+def _render_skill_files(name: str, description: str, triggers: tuple) -> tuple:
+    """(SKILL.md, skill.py, __init__.py) contents for a new skill."""
+    class_name = "".join(word.capitalize() for word in name.split("_")) + "Skill"
+    title = " ".join(word.capitalize() for word in name.split("_"))
+    triggers_yaml = "\n".join(f'    - "{t}"' for t in triggers)
+    skill_md = SKILL_TEMPLATE.format(
+        name=name,
+        description=description,
+        title=title,
+        triggers_yaml=triggers_yaml
+    )
+    skill_py = SKILL_PY_TEMPLATE.format(
+        name=name,
+        description=description,
+        title=title,
+        class_name=class_name,
+        triggers=list(triggers)
+    )
+    init_py = INIT_TEMPLATE.format(class_name=class_name)
+    return skill_md, skill_py, init_py
+
+
+def _write_files(files) -> None:
+    """Write (path, text) pairs as UTF-8, one unbuffered write per file."""
+    for path, text in files:
+        data = memoryview(text.encode("utf-8"))
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            while data:
+                data = data[os.write(fd, data):]
+        finally:
+            os.close(fd)
+
+
 class SkillCreatorSkill(SkillBase):
     """Meta-skill for creating new skills."""
     
@@ -89,7 +127,7 @@ class SkillCreatorSkill(SkillBase):
     
     def _execute(self, query: str, context: dict = None) -> dict:
         # Parse the skill name from query
-        match = re.search(r'(?:create|new|add|generate)\s+skill\s+["\']?(\w+)["\']?', query, re.I)
+        match = _SKILL_NAME_RE.search(query)
         if not match:
             return {
                 "status": "error",
@@ -115,35 +153,13 @@ class SkillCreatorSkill(SkillBase):
         # Create directory
         skill_dir.mkdir(parents=True, exist_ok=True)
         
-        # Generate class name
-        class_name = "".join(word.capitalize() for word in name.split("_")) + "Skill"
-        title = " ".join(word.capitalize() for word in name.split("_"))
-        
-        # Generate triggers YAML
-        triggers_yaml = "\n".join(f'    - "{t}"' for t in triggers)
-        
-        # Write SKILL.md
-        skill_md = SKILL_TEMPLATE.format(
-            name=name,
-            description=description,
-            title=title,
-            triggers_yaml=triggers_yaml
-        )
-        (skill_dir / "SKILL.md").write_text(skill_md)
-        
-        # Write skill.py
-        skill_py = SKILL_PY_TEMPLATE.format(
-            name=name,
-            description=description,
-            title=title,
-            class_name=class_name,
-            triggers=triggers
-        )
-        (skill_dir / "skill.py").write_text(skill_py)
-        
-        # Write __init__.py
-        init_py = INIT_TEMPLATE.format(class_name=class_name)
-        (skill_dir / "__init__.py").write_text(init_py)
+        # Render (cached) and write the skill files
+        skill_md, skill_py, init_py = _render_skill_files(name, description, tuple(triggers))
+        _write_files([
+            (skill_dir / "SKILL.md", skill_md),
+            (skill_dir / "skill.py", skill_py),
+            (skill_dir / "__init__.py", init_py),
+        ])
         
         return {
             "status": "success",
@@ -8,6 +8,9 @@ import json
 from unittest.mock import Mock, patch, MagicMock
 import numpy as np
 
+# One OpenAI-sized embedding shared by every mocked embeddings response
+MOCK_EMBEDDING = [0.1] * 1536
+
 
 class TestVectorStore(unittest.TestCase):
     """Tests for vector store functionality"""
@@ -26,6 +29,14 @@ class TestVectorStore(unittest.TestCase):
                 "model": "gpt-4o-mini"
             })
             settings.insert()
+        
+        # One OpenAI mock for the whole class
+        patcher = patch('raven_ai_agent.utils.vector_store.OpenAI')
+        cls.mock_openai = patcher.start()
+        cls.addClassCleanup(patcher.stop)
+        cls.mock_openai.return_value.embeddings.create.return_value = Mock(
+            data=[Mock(embedding=MOCK_EMBEDDING)]
+        )
     
     def test_cosine_similarity(self):
         """Test cosine similarity calculation"""
@@ -43,35 +54,84 @@ class TestVectorStore(unittest.TestCase):
         # Opposite vectors should have similarity -1.0
         vec4 = [-1.0, 0.0, 0.0]
         self.assertAlmostEqual(VectorStore.cosine_similarity(vec1, vec4), -1.0, places=5)
+        
+        # float32 arrays take the same path without a copy
+        arr1 = np.array(vec1, dtype=np.float32)
+        self.assertIs(np.asarray(arr1, dtype=np.float32), arr1)
+        self.assertAlmostEqual(VectorStore.cosine_similarity(arr1, np.array(vec4, dtype=np.float32)), -1.0, places=5)
     
-    @patch('raven_ai_agent.utils.vector_store.OpenAI')
-    def test_get_embedding(self, mock_openai):
-        """Test embedding generation"""
+    def test_cosine_similarities_matches_pairwise(self):
+        """Batched similarity equals the pairwise calculation"""
+        from raven_ai_agent.utils.vector_store import VectorStore
+        
+        rng = np.random.default_rng(7)
+        matrix = rng.standard_normal((20, 1536)).astype(np.float32)
+        q = rng.standard_normal(1536).astype(np.float32)
+        batched = VectorStore.cosine_similarities(matrix, q)
+        for row, value in zip(matrix, batched):
+            self.assertAlmostEqual(float(value), VectorStore.cosine_similarity(row, q), places=5)
+    
+    def test_find_duplicates_parses_each_embedding_once(self):
+        """Duplicates are found greedily, as pairs against earlier memories"""
         from raven_ai_agent.utils.vector_store import VectorStore
         
-        # Mock OpenAI response
-        mock_embedding = [0.1] * 1536
-        mock_response = Mock()
-        mock_response.data = [Mock(embedding=mock_embedding)]
-        mock_openai.return_value.embeddings.create.return_value = mock_response
+        memories = [
+            frappe._dict(name=name, content=name, embedding=json.dumps(emb))
+            for name, emb in [("a", [1.0, 0.0]), ("b", [0.0, 1.0]), ("c", [1.0, 0.01]), ("d", [1.0, 0.0])]
+        ]
+        store = VectorStore()
+        with patch('raven_ai_agent.utils.vector_store.frappe.get_list', return_value=memories), \
+             patch.object(VectorStore, '_parse_embedding', side_effect=VectorStore._parse_embedding) as parse:
+            duplicates = store.find_duplicates("Administrator", threshold=0.95)
+        
+        self.assertEqual(parse.call_count, 4)
+        self.assertEqual([(d["memory_1"], d["memory_2"]) for d in duplicates], [("a", "c"), ("a", "d")])
+
+    def test_search_similar_reuses_cached_matrix(self):
+        """A user's embeddings are parsed once per process until their memories change"""
+        from raven_ai_agent.utils import vector_store
+        from raven_ai_agent.utils.vector_store import VectorStore
+
+        def memories():
+            return [
+                frappe._dict(name=name, content=name, importance="Normal", memory_type="Fact",
+                             source="Test", creation=None, embedding=json.dumps(emb))
+                for name, emb in [("near", [0.1] * 1536), ("far", [0.1] * 768 + [-0.1] * 768)]
+            ]
+
+        store = VectorStore()
+        fingerprint = [(2, "2026-10-18 10:00:00")]
+        with patch.dict(vector_store._MATRIX_CACHE, clear=True), \
+             patch('raven_ai_agent.utils.vector_store.frappe.db.sql', side_effect=lambda *a, **k: fingerprint), \
+             patch('raven_ai_agent.utils.vector_store.frappe.get_list', side_effect=lambda *a, **k: memories()) as get_list:
+            first = store.search_similar("Administrator", "query")
+            second = store.search_similar("Administrator", "query", similarity_threshold=-1)
+            fingerprint[0] = (3, "2026-10-18 10:05:00")
+            store.search_similar("Administrator", "query")
+            self.assertEqual(list(vector_store._MATRIX_CACHE), [(frappe.local.site, frappe.session.user, "Administrator")])
+
+            with patch.object(vector_store, "MATRIX_CACHE_MAX", 1):
+                store.search_similar("Guest", "query")
+            self.assertEqual([key[2] for key in vector_store._MATRIX_CACHE], ["Guest"])
+
+        self.assertEqual(get_list.call_count, 3)
+        self.assertEqual([(r.name, r.similarity) for r in first], [("near", 1.0)])
+        self.assertEqual([r.name for r in second], ["near", "far"])
+    
+    def test_get_embedding(self):
+        """Test embedding generation"""
+        from raven_ai_agent.utils.vector_store import VectorStore
         
         store = VectorStore()
         embedding = store.get_embedding("test text")
         
         self.assertEqual(len(embedding), 1536)
-        self.assertEqual(embedding, mock_embedding)
+        self.assertEqual(embedding, MOCK_EMBEDDING)
     
-    @patch('raven_ai_agent.utils.vector_store.OpenAI')
-    def test_store_memory_with_embedding(self, mock_openai):
+    def test_store_memory_with_embedding(self):
         """Test storing memory with embedding"""
         from raven_ai_agent.utils.vector_store import VectorStore
         
-        # Mock OpenAI
-        mock_embedding = [0.1] * 1536
-        mock_response = Mock()
-        mock_response.data = [Mock(embedding=mock_embedding)]
-        mock_openai.return_value.embeddings.create.return_value = mock_response
-        
         store = VectorStore()
         memory_name = store.store_memory_with_embedding(
             user="Administrator",
@@ -99,73 +159,101 @@ class TestRaymondLucyAgent(unittest.TestCase):
     def setUpClass(cls):
         """Set up test fixtures"""
         frappe.set_user("Administrator")
+        
+        # Settings and OpenAI client patched once for the whole class
+        from raven_ai_agent.api.agent import RaymondLucyAgent
+        for patcher in (
+            patch.object(RaymondLucyAgent, '_get_settings', return_value={"openai_api_key": "test"}),
+            patch('raven_ai_agent.api.agent.OpenAI'),
+        ):
+            patcher.start()
+            cls.addClassCleanup(patcher.stop)
     
     def test_determine_autonomy_level_1(self):
         """Test autonomy detection for read-only queries"""
         from raven_ai_agent.api.agent import RaymondLucyAgent
         
-        with patch.object(RaymondLucyAgent, '_get_settings', return_value={"openai_api_key": "test"}):
-            with patch('raven_ai_agent.api.agent.OpenAI'):
-                agent = RaymondLucyAgent("Administrator")
-                
-                # Read-only queries should be Level 1
-                self.assertEqual(agent.determine_autonomy("Show me invoices"), 1)
-                self.assertEqual(agent.determine_autonomy("What are my sales?"), 1)
-                self.assertEqual(agent.determine_autonomy("List customers"), 1)
+        agent = RaymondLucyAgent("Administrator")
+        
+        # Read-only queries should be Level 1
+        self.assertEqual(agent.determine_autonomy("Show me invoices"), 1)
+        self.assertEqual(agent.determine_autonomy("What are my sales?"), 1)
+        self.assertEqual(agent.determine_autonomy("List customers"), 1)
     
     def test_determine_autonomy_level_2(self):
         """Test autonomy detection for modification queries"""
         from raven_ai_agent.api.agent import RaymondLucyAgent
         
-        with patch.object(RaymondLucyAgent, '_get_settings', return_value={"openai_api_key": "test"}):
-            with patch('raven_ai_agent.api.agent.OpenAI'):
-                agent = RaymondLucyAgent("Administrator")
-                
-                # Modification queries should be Level 2
-                self.assertEqual(agent.determine_autonomy("Update the customer name"), 2)
-                self.assertEqual(agent.determine_autonomy("Change the price"), 2)
-                self.assertEqual(agent.determine_autonomy("Modify the order"), 2)
+        agent = RaymondLucyAgent("Administrator")
+        
+        # Modification queries should be Level 2
+        self.assertEqual(agent.determine_autonomy("Update the customer name"), 2)
+        self.assertEqual(agent.determine_autonomy("Change the price"), 2)
+        self.assertEqual(agent.determine_autonomy("Modify the order"), 2)
     
     def test_determine_autonomy_level_3(self):
         """Test autonomy detection for dangerous operations"""
         from raven_ai_agent.api.agent import RaymondLucyAgent
         
-        with patch.object(RaymondLucyAgent, '_get_settings', return_value={"openai_api_key": "test"}):
-            with patch('raven_ai_agent.api.agent.OpenAI'):
-                agent = RaymondLucyAgent("Administrator")
-                
-                # Dangerous operations should be Level 3
-                self.assertEqual(agent.determine_autonomy("Delete all invoices"), 3)
-                self.assertEqual(agent.determine_autonomy("Submit the document"), 3)
-                self.assertEqual(agent.determine_autonomy("Create invoice and submit"), 3)
+        agent = RaymondLucyAgent("Administrator")
+        
+        # Dangerous operations should be Level 3
+        self.assertEqual(agent.determine_autonomy("Delete all invoices"), 3)
+        self.assertEqual(agent.determine_autonomy("Submit the document"), 3)
+        self.assertEqual(agent.determine_autonomy("Create invoice and submit"), 3)
     
     def test_get_morning_briefing_empty(self):
         """Test morning briefing with no memories"""
         from raven_ai_agent.api.agent import RaymondLucyAgent
         
-        with patch.object(RaymondLucyAgent, '_get_settings', return_value={"openai_api_key": "test"}):
-            with patch('raven_ai_agent.api.agent.OpenAI'):
-                agent = RaymondLucyAgent("test_user_empty@example.com")
-                briefing = agent.get_morning_briefing()
-                
-                self.assertIn("Morning Briefing", briefing)
+        agent = RaymondLucyAgent("test_user_empty@example.com")
+        briefing = agent.get_morning_briefing()
+        
+        self.assertIn("Morning Briefing", briefing)
     
     def test_get_erpnext_context_invoices(self):
         """Test ERPNext context retrieval for invoice queries"""
         from raven_ai_agent.api.agent import RaymondLucyAgent
         
-        with patch.object(RaymondLucyAgent, '_get_settings', return_value={"openai_api_key": "test"}):
-            with patch('raven_ai_agent.api.agent.OpenAI'):
-                agent = RaymondLucyAgent("Administrator")
-                context = agent.get_erpnext_context("Show me recent invoices")
-                
-                # Should attempt to query Sales Invoice
-                self.assertIsInstance(context, str)
+        agent = RaymondLucyAgent("Administrator")
+        context = agent.get_erpnext_context("Show me recent invoices")
+        
+        # Should attempt to query Sales Invoice
+        self.assertIsInstance(context, str)
 
 
 class TestAIMemoryDoctype(unittest.TestCase):
     """Tests for AI Memory doctype"""
     
+    def setUp(self):
+        """Open a savepoint so each test's documents are rolled back, not deleted"""
+        frappe.db.savepoint("ai_memory_test")
+    
+    def tearDown(self):
+        frappe.db.rollback(save_point="ai_memory_test")
+    
+    def _insert_memories(self, field, values):
+        """Insert one validated memory per value and read them back in one query"""
+        names = {}
+        for value in values:
+            memory = frappe.get_doc({
+                "doctype": "AI Memory",
+                "user": "Administrator",
+                "content": f"Test {value} memory",
+                "importance": "Normal",
+                "memory_type": "Fact",
+                field: value
+            })
+            memory.insert()
+            names[memory.name] = value
+        
+        loaded = frappe.get_all(
+            "AI Memory",
+            filters={"name": ["in", list(names)]},
+            fields=["name", field]
+        )
+        return names, {row.name: row[field] for row in loaded}
+    
     def test_create_memory(self):
         """Test creating a memory document"""
         memory = frappe.get_doc({
@@ -179,43 +267,16 @@ class TestAIMemoryDoctype(unittest.TestCase):
         
         self.assertIsNotNone(memory.name)
         self.assertEqual(memory.content, "Test memory")
-        
-        # Cleanup
-        frappe.delete_doc("AI Memory", memory.name)
     
     def test_memory_importance_levels(self):
         """Test all importance levels"""
-        for importance in ["Critical", "High", "Normal", "Low"]:
-            memory = frappe.get_doc({
-                "doctype": "AI Memory",
-                "user": "Administrator",
-                "content": f"Test {importance} memory",
-                "importance": importance,
-                "memory_type": "Fact"
-            })
-            memory.insert()
-            
-            loaded = frappe.get_doc("AI Memory", memory.name)
-            self.assertEqual(loaded.importance, importance)
-            
-            frappe.delete_doc("AI Memory", memory.name)
+        expected, loaded = self._insert_memories("importance", ["Critical", "High", "Normal", "Low"])
+        self.assertEqual(loaded, expected)
     
     def test_memory_types(self):
         """Test all memory types"""
-        for memory_type in ["Fact", "Preference", "Summary", "Correction"]:
-            memory = frappe.get_doc({
-                "doctype": "AI Memory",
-                "user": "Administrator",
-                "content": f"Test {memory_type}",
-                "importance": "Normal",
-                "memory_type": memory_type
-            })
-            memory.insert()
-            
-            loaded = frappe.get_doc("AI Memory", memory.name)
-            self.assertEqual(loaded.memory_type, memory_type)
-            
-            frappe.delete_doc("AI Memory", memory.name)
+        expected, loaded = self._insert_memories("memory_type", ["Fact", "Preference", "Summary", "Correction"])
+        self.assertEqual(loaded, expected)
 
 
 class TestProtocolCompliance(unittest.TestCase):
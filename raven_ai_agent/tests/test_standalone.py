@@ -2,21 +2,90 @@
 Standalone Unit Tests (No Frappe Required)
 Run with: pytest test_standalone.py -v
 """
+import re
 import pytest
 import numpy as np
 import json
 from unittest.mock import Mock, patch, MagicMock
 
+# (category, label, keywords) for every keyword classifier below
+_KEYWORDS = (
+    ("autonomy", 3, ("delete", "cancel", "submit", "create invoice", "payment")),
+    ("autonomy", 2, ("update", "change", "modify", "set", "add")),
+    ("importance", "Critical", ("api key", "password", "secret", "credential")),
+    ("importance", "High", ("preference", "always", "never", "important")),
+    ("importance", "Low", ("maybe", "sometimes", "might")),
+    ("doctype", "Sales Invoice", ("invoice", "sales", "revenue")),
+    ("doctype", "Customer", ("customer", "client")),
+    ("doctype", "Item", ("item", "product", "stock")),
+    ("doctype", "Purchase Order", ("order", "purchase")),
+    ("doctype", "Employee", ("employee", "staff")),
+)
+_DOCTYPES = tuple(label for category, label, _ in _KEYWORDS if category == "doctype")
+
+
+def _keyword_scanner(use_automaton=True):
+    """
+    scan(text) -> set of (category, label) whose keywords occur in text
+    (case-insensitive substrings), found in one pass over the text.
+    
+    Uses a pyahocorasick automaton when installed, otherwise one zero-width
+    lookahead alternation (longest first) where a matched keyword also
+    counts the keywords it starts with.
+    """
+    labels = {}
+    for category, label, words in _KEYWORDS:
+        for word in words:
+            labels.setdefault(word, set()).add((category, label))
+    
+    try:
+        import ahocorasick
+    except ImportError:  # pyahocorasick is optional
+        ahocorasick = None
+    
+    if use_automaton and ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for word, hits in labels.items():
+            automaton.add_word(word, hits)
+        automaton.make_automaton()
+        
+        def scan(text):
+            return set().union(*(hits for _, hits in automaton.iter(text.lower())))
+        
+        return scan
+    
+    words = sorted(labels, key=len, reverse=True)
+    pattern = re.compile("(?=(" + "|".join(map(re.escape, words)) + "))", re.IGNORECASE)
+    prefix_hits = {w: set().union(*(labels[p] for p in words if w.startswith(p))) for w in words}
+    
+    def scan(text):
+        return set().union(*(prefix_hits.get(word.lower(), ()) for word in pattern.findall(text)))
+    
+    return scan
+
+
+_scan_keywords = _keyword_scanner()
+
 
 class TestCosineSimilarity:
     """Test cosine similarity calculations"""
     
     @staticmethod
     def cosine_similarity(a, b):
-        """Local implementation for testing"""
-        a = np.array(a)
-        b = np.array(b)
-        return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+        """Local implementation for testing (float32; one sqrt over both squared norms)"""
+        a = np.asarray(a, dtype=np.float32)
+        b = np.asarray(b, dtype=np.float32)
+        return float(np.dot(a, b) / np.sqrt(np.vdot(a, a) * np.vdot(b, b)))
+    
+    @staticmethod
+    def cosine_matrix(A, B):
+        """Cosine similarity of every row of A against every row of B, as one matmul"""
+        # float32 copies, so normalizing rows in place never touches the caller's arrays
+        A = np.array(A, dtype=np.float32, ndmin=2)
+        B = np.array(B, dtype=np.float32, ndmin=2)
+        A /= np.linalg.norm(A, axis=1)[:, None]
+        B /= np.linalg.norm(B, axis=1)[:, None]
+        return A @ B.T
     
     def test_identical_vectors(self):
         """Identical vectors should have similarity 1.0"""
@@ -45,11 +114,17 @@ class TestCosineSimilarity:
     def test_high_dimensional_vectors(self):
         """Test with high-dimensional vectors (like embeddings)"""
         np.random.seed(42)
-        vec1 = np.random.randn(1536).tolist()
-        vec2 = np.random.randn(1536).tolist()
+        vectors = np.random.randn(8, 1536)
         
-        similarity = self.cosine_similarity(vec1, vec2)
+        similarities = self.cosine_matrix(vectors, vectors)
+        assert similarities.shape == (8, 8)
+        assert np.all((-1.0001 <= similarities) & (similarities <= 1.0001))
+        assert np.allclose(np.diag(similarities), 1.0, atol=1e-4)
+        
+        # the batched kernel agrees with the pairwise one
+        similarity = self.cosine_similarity(vectors[0].tolist(), vectors[1].tolist())
         assert -1.0 <= similarity <= 1.0
+        assert abs(float(similarities[0, 1]) - similarity) < 1e-4
 
 
 class TestAutonomyDetection:
@@ -58,14 +133,14 @@ class TestAutonomyDetection:
     @staticmethod
     def determine_autonomy(query: str) -> int:
         """Local implementation for testing"""
-        query_lower = query.lower()
+        hits = _scan_keywords(query)
         
         # Level 3 keywords (dangerous operations)
-        if any(word in query_lower for word in ["delete", "cancel", "submit", "create invoice", "payment"]):
+        if ("autonomy", 3) in hits:
             return 3
         
         # Level 2 keywords (modifications)
-        if any(word in query_lower for word in ["update", "change", "modify", "set", "add"]):
+        if ("autonomy", 2) in hits:
             return 2
         
         # Default to Level 1 (read-only)
@@ -150,19 +225,12 @@ class TestMemoryImportance:
     @staticmethod
     def classify_importance(content: str, source: str = None) -> str:
         """Classify memory importance"""
-        content_lower = content.lower()
-        
-        # Critical patterns
-        if any(word in content_lower for word in ["api key", "password", "secret", "credential"]):
-            return "Critical"
-        
-        # High patterns
-        if any(word in content_lower for word in ["preference", "always", "never", "important"]):
-            return "High"
+        hits = _scan_keywords(content)
         
-        # Low patterns
-        if any(word in content_lower for word in ["maybe", "sometimes", "might"]):
-            return "Low"
+        # Critical, then High, then Low patterns
+        for importance in ("Critical", "High", "Low"):
+            if ("importance", importance) in hits:
+                return importance
         
         return "Normal"
     
@@ -209,6 +277,45 @@ class TestEmbeddingStorage:
         # Check precision is maintained
         for orig, restored in zip(embedding, deserialized):
             assert abs(orig - restored) < 1e-10
+    
+    def test_binary_embedding_round_trip(self):
+        """float32 embeddings round-trip byte-exact through the stored form"""
+        from raven_ai_agent.utils.embeddings import deserialize_embedding, serialize_embedding
+        
+        np.random.seed(42)
+        embedding = np.random.randn(1536).astype(np.float32)
+        stored = serialize_embedding(embedding)
+        
+        assert isinstance(json.loads(stored), str)  # still valid JSON for the field
+        assert len(stored) < len(json.dumps(embedding.tolist())) / 3
+        restored = deserialize_embedding(stored)
+        assert restored.dtype == np.float32
+        assert restored.tobytes() == embedding.tobytes()
+    
+    def test_json_embeddings_still_read(self):
+        """Legacy rows and the as_json debug form decode to the same vector"""
+        from raven_ai_agent.utils.embeddings import deserialize_embedding, serialize_embedding
+        
+        embedding = [0.5, -1.25, 3.0]
+        debug = serialize_embedding(embedding, as_json=True)
+        assert json.loads(debug) == embedding
+        for stored in (json.dumps(embedding), debug, serialize_embedding(embedding)):
+            assert deserialize_embedding(stored).tolist() == embedding
+
+    def test_int8_embedding_round_trip(self):
+        """int8 storage is ~4x smaller and keeps cosine similarity"""
+        from raven_ai_agent.utils.embeddings import deserialize_embedding, serialize_embedding
+        
+        rng = np.random.default_rng(3)
+        embedding = rng.standard_normal(1536).astype(np.float32)
+        stored = serialize_embedding(embedding, quantize=True)
+        assert len(stored) < len(serialize_embedding(embedding)) / 3.5
+        restored = deserialize_embedding(stored)
+        
+        assert restored.dtype == np.float32
+        cos = float(restored @ embedding / (np.linalg.norm(restored) * np.linalg.norm(embedding)))
+        assert cos > 0.9995
+        assert deserialize_embedding(serialize_embedding(np.zeros(4), quantize=True)).tolist() == [0.0] * 4
 
 
 class TestQueryParsing:
@@ -217,21 +324,8 @@ class TestQueryParsing:
     @staticmethod
     def detect_erpnext_intent(query: str) -> list:
         """Detect ERPNext doctypes from query"""
-        query_lower = query.lower()
-        intents = []
-        
-        if any(word in query_lower for word in ["invoice", "sales", "revenue"]):
-            intents.append("Sales Invoice")
-        if any(word in query_lower for word in ["customer", "client"]):
-            intents.append("Customer")
-        if any(word in query_lower for word in ["item", "product", "stock"]):
-            intents.append("Item")
-        if any(word in query_lower for word in ["order", "purchase"]):
-            intents.append("Purchase Order")
-        if any(word in query_lower for word in ["employee", "staff"]):
-            intents.append("Employee")
-        
-        return intents
+        hits = _scan_keywords(query)
+        return [doctype for doctype in _DOCTYPES if ("doctype", doctype) in hits]
     
     def test_invoice_intent(self):
         """Test invoice-related queries"""
@@ -253,6 +347,22 @@ class TestQueryParsing:
         """Test queries with no specific intent"""
         intents = self.detect_erpnext_intent("Hello, how are you?")
         assert len(intents) == 0
+    
+    @pytest.mark.parametrize("use_automaton", [True, False])
+    def test_keyword_scan_matches_substring_checks(self, use_automaton):
+        """One-pass keyword scan finds exactly the categories substring checks would"""
+        import random
+        if use_automaton:
+            pytest.importorskip("ahocorasick")
+        scan = _keyword_scanner(use_automaton)
+        words = [w for _, _, group in _KEYWORDS for w in group]
+        pieces = words + [w.upper() for w in words[:5]] + [" ", "x", "pay", "API"]
+        rng = random.Random(7)
+        for _ in range(300):
+            text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 5)))
+            expected = {(category, label) for category, label, group in _KEYWORDS
+                        if any(w in text.lower() for w in group)}
+            assert scan(text) == expected, text
 
 
 class TestRateLimiting:
@@ -9,6 +9,8 @@ Features:
 - Cost optimization suggestions
 """
 
+import uuid
+
 import frappe
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
@@ -65,14 +67,19 @@ class CostMonitor:
         "abab6.5g-chat": {"input": 0.50, "output": 2.00},
         "abab5.5-chat": {"input": 0.20, "output": 0.80},
     }
+    DEFAULT_PRICING = {"input": 1.0, "output": 2.0}  # models missing from PRICING
+    
+    # (input, output) per model for calculate_cost
+    _PRICE_PAIRS = {model: (p["input"], p["output"]) for model, p in PRICING.items()}
+    _DEFAULT_PAIR = (DEFAULT_PRICING["input"], DEFAULT_PRICING["output"])
     
     def __init__(self):
         self.settings = self._load_settings()
     
     def _load_settings(self) -> Dict:
-        """Load cost monitoring settings"""
+        """Load cost monitoring settings (from the cached Single, no DB read per monitor)"""
         try:
-            settings = frappe.get_single("AI Agent Settings")
+            settings = frappe.get_cached_doc("AI Agent Settings")
             return {
                 "daily_budget": getattr(settings, "daily_budget", 10.0),
                 "monthly_budget": getattr(settings, "monthly_budget", 100.0),
@@ -98,12 +105,8 @@ class CostMonitor:
         output_tokens: int
     ) -> float:
         """Calculate cost for a request"""
-        pricing = self.PRICING.get(model, {"input": 1.0, "output": 2.0})
-        
-        input_cost = (input_tokens / 1_000_000) * pricing["input"]
-        output_cost = (output_tokens / 1_000_000) * pricing["output"]
-        
-        return round(input_cost + output_cost, 6)
+        price_in, price_out = self._PRICE_PAIRS.get(model, self._DEFAULT_PAIR)
+        return round((input_tokens * price_in + output_tokens * price_out) / 1_000_000, 6)
     
     def record_usage(
         self,
@@ -124,21 +127,20 @@ class CostMonitor:
         
         cost = self.calculate_cost(model, input_tokens, output_tokens)
         user = user or frappe.session.user
+        now = datetime.now()
         
-        # Store in database
+        # Store in database: a plain INSERT (the log has no controller logic),
+        # committed with the rest of the request/job rather than on its own
         try:
-            doc = frappe.get_doc({
-                "doctype": "AI Usage Log",
-                "user": user,
-                "provider": provider,
-                "model": model,
-                "input_tokens": input_tokens,
-                "output_tokens": output_tokens,
-                "cost_usd": cost,
-                "timestamp": datetime.now()
-            })
-            doc.insert(ignore_permissions=True)
-            frappe.db.commit()
+            frappe.db.sql("""
+                INSERT INTO `tabAI Usage Log` (
+                    name, user, provider, model, input_tokens, output_tokens,
+                    cost_usd, timestamp, creation, modified, owner, modified_by
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (
+                uuid.uuid4().hex, user, provider, model, input_tokens, output_tokens,
+                cost, now, now, now, frappe.session.user, frappe.session.user
+            ))
         except Exception as e:
             # Log might not exist, just track in memory
             frappe.logger().warning(f"[CostMonitor] Could not log usage: {e}")
@@ -150,8 +152,9 @@ class CostMonitor:
     
     def _check_budgets(self, latest_cost: float) -> Optional[Dict]:
         """Check if any budget thresholds are exceeded"""
-        daily_usage = self.get_usage_period("day")
-        monthly_usage = self.get_usage_period("month")
+        usage = self.get_usage_periods("day", "month", "hour", "week")
+        daily_usage = usage["day"]
+        monthly_usage = usage["month"]
         
         daily_budget = self.settings["daily_budget"]
         monthly_budget = self.settings["monthly_budget"]
@@ -195,8 +198,8 @@ class CostMonitor:
             })
         
         # Check for sudden spike (>3x normal hourly rate)
-        hourly_usage = self.get_usage_period("hour")
-        avg_hourly = self._get_average_hourly_usage()
+        hourly_usage = usage["hour"]
+        avg_hourly = usage["week"] / 168
         if avg_hourly > 0 and hourly_usage > avg_hourly * 3:
             alerts.append({
                 "level": AlertLevel.WARNING,
@@ -208,90 +211,80 @@ class CostMonitor:
         
         return alerts[0] if alerts else None
     
+    @staticmethod
+    def _period_start(period: str, now: datetime) -> datetime:
+        """Start of an hour/day/week/month usage period ending now"""
+        if period == "hour":
+            return now - timedelta(hours=1)
+        elif period == "day":
+            return now.replace(hour=0, minute=0, second=0)
+        elif period == "week":
+            return now - timedelta(days=7)
+        elif period == "month":
+            return now.replace(day=1, hour=0, minute=0, second=0)
+        else:
+            return now - timedelta(days=1)
+    
     def get_usage_period(self, period: str) -> float:
         """Get total usage for a period (hour, day, week, month)"""
+        return self.get_usage_periods(period)[period]
+    
+    def get_usage_periods(self, *periods: str) -> Dict[str, float]:
+        """
+        Total usage for several periods from one query: a conditional sum
+        per period over the rows since the earliest start. The
+        (timestamp, cost_usd) index from patch add_ai_usage_log_indexes
+        makes this an index-only range scan.
+        """
+        now = datetime.now()
+        starts = [self._period_start(period, now) for period in periods]
+        params = {f"p{i}": start for i, start in enumerate(starts)}
+        params["since"] = min(starts)
+        columns = ", ".join(
+            f"COALESCE(SUM(CASE WHEN timestamp >= %(p{i})s THEN cost_usd END), 0) AS p{i}"
+            for i in range(len(starts))
+        )
+        
         try:
-            if period == "hour":
-                start = datetime.now() - timedelta(hours=1)
-            elif period == "day":
-                start = datetime.now().replace(hour=0, minute=0, second=0)
-            elif period == "week":
-                start = datetime.now() - timedelta(days=7)
-            elif period == "month":
-                start = datetime.now().replace(day=1, hour=0, minute=0, second=0)
-            else:
-                start = datetime.now() - timedelta(days=1)
-            
-            result = frappe.db.sql("""
-                SELECT COALESCE(SUM(cost_usd), 0) as total
+            result = frappe.db.sql(f"""
+                SELECT {columns}
                 FROM `tabAI Usage Log`
-                WHERE timestamp >= %s
-            """, (start,), as_dict=True)
+                WHERE timestamp >= %(since)s
+            """, params, as_dict=True)
             
-            return float(result[0]["total"]) if result else 0.0
+            row = result[0] if result else {}
+            return {period: float(row.get(f"p{i}") or 0) for i, period in enumerate(periods)}
         except Exception:
-            return 0.0
+            return {period: 0.0 for period in periods}
     
     def _get_average_hourly_usage(self) -> float:
         """Get average hourly usage over past 7 days"""
-        try:
-            result = frappe.db.sql("""
-                SELECT COALESCE(SUM(cost_usd), 0) / 168 as avg_hourly
-                FROM `tabAI Usage Log`
-                WHERE timestamp >= DATE_SUB(NOW(), INTERVAL 7 DAY)
-            """, as_dict=True)
-            return float(result[0]["avg_hourly"]) if result else 0.0
-        except Exception:
-            return 0.0
+        return self.get_usage_period("week") / 168
     
     def get_usage_report(self, days: int = 30) -> Dict:
         """Generate usage report"""
         try:
-            # By provider
-            by_provider = frappe.db.sql("""
-                SELECT provider, 
+            # One grouped scan; the four breakdowns are rolled up from it
+            rows = frappe.db.sql("""
+                SELECT provider, model, user,
+                       DATE(timestamp) as date,
                        SUM(input_tokens) as total_input,
                        SUM(output_tokens) as total_output,
                        SUM(cost_usd) as total_cost,
                        COUNT(*) as requests
                 FROM `tabAI Usage Log`
                 WHERE timestamp >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                GROUP BY provider
-                ORDER BY total_cost DESC
+                GROUP BY provider, model, user, DATE(timestamp)
             """, (days,), as_dict=True)
             
-            # By model
-            by_model = frappe.db.sql("""
-                SELECT model,
-                       SUM(cost_usd) as total_cost,
-                       COUNT(*) as requests
-                FROM `tabAI Usage Log`
-                WHERE timestamp >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                GROUP BY model
-                ORDER BY total_cost DESC
-            """, (days,), as_dict=True)
-            
-            # By user
-            by_user = frappe.db.sql("""
-                SELECT user,
-                       SUM(cost_usd) as total_cost,
-                       COUNT(*) as requests
-                FROM `tabAI Usage Log`
-                WHERE timestamp >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                GROUP BY user
-                ORDER BY total_cost DESC
-                LIMIT 10
-            """, (days,), as_dict=True)
-            
-            # Daily trend
-            daily_trend = frappe.db.sql("""
-                SELECT DATE(timestamp) as date,
-                       SUM(cost_usd) as cost
-                FROM `tabAI Usage Log`
-                WHERE timestamp >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                GROUP BY DATE(timestamp)
-                ORDER BY date
-            """, (days,), as_dict=True)
+            by_provider = _rollup(rows, "provider", ("total_input", "total_output", "total_cost", "requests"))
+            by_model = _rollup(rows, "model", ("total_cost", "requests"))
+            by_user = _rollup(rows, "user", ("total_cost", "requests"))[:10]
+            daily_trend = sorted(
+                ({"date": row["date"], "cost": row["total_cost"]}
+                 for row in _rollup(rows, "date", ("total_cost",))),
+                key=lambda row: row["date"]
+            )
             
             return {
                 "period_days": days,
@@ -340,8 +333,9 @@ class CostMonitor:
         if not self.settings.get("block_on_budget_exceeded"):
             return False, None
         
-        daily_usage = self.get_usage_period("day")
-        monthly_usage = self.get_usage_period("month")
+        usage = self.get_usage_periods("day", "month")
+        daily_usage = usage["day"]
+        monthly_usage = usage["month"]
         
         if daily_usage >= self.settings["daily_budget"]:
             return True, f"Daily budget exceeded (${daily_usage:.2f}/${self.settings['daily_budget']:.2f})"
@@ -352,6 +346,18 @@ class CostMonitor:
         return False, None
 
 
+def _rollup(rows: List[Dict], key: str, fields: Tuple[str, ...]) -> List[Dict]:
+    """Sum grouped usage rows again by one key, highest total_cost first"""
+    groups: Dict = {}
+    for row in rows:
+        group = groups.get(row[key])
+        if group is None:
+            group = groups[row[key]] = {key: row[key], **{field: 0 for field in fields}}
+        for field in fields:
+            group[field] += row[field] or 0
+    return sorted(groups.values(), key=lambda group: group["total_cost"], reverse=True)
+
+
 # Singleton instance
 _cost_monitor = None
 
@@ -376,15 +382,16 @@ def get_usage_report(days: int = 30) -> Dict:
 def get_current_usage() -> Dict:
     """API: Get current usage status"""
     monitor = get_cost_monitor()
+    usage = monitor.get_usage_periods("hour", "day", "week", "month")
     return {
-        "hourly": monitor.get_usage_period("hour"),
-        "daily": monitor.get_usage_period("day"),
-        "weekly": monitor.get_usage_period("week"),
-        "monthly": monitor.get_usage_period("month"),
+        "hourly": usage["hour"],
+        "daily": usage["day"],
+        "weekly": usage["week"],
+        "monthly": usage["month"],
         "daily_budget": monitor.settings["daily_budget"],
         "monthly_budget": monitor.settings["monthly_budget"],
-        "daily_pct": monitor.get_usage_period("day") / monitor.settings["daily_budget"] * 100,
-        "monthly_pct": monitor.get_usage_period("month") / monitor.settings["monthly_budget"] * 100,
+        "daily_pct": usage["day"] / monitor.settings["daily_budget"] * 100,
+        "monthly_pct": usage["month"] / monitor.settings["monthly_budget"] * 100,
     }
 
 
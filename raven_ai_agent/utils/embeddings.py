@@ -0,0 +1,54 @@
+"""
+Embedding Serialization for AI Memory
+Stores embeddings as float32 bytes (base64) inside the JSON `embedding` field,
+or optionally as int8 bytes with a per-vector scale
+"""
+import base64
+import json
+from typing import Tuple
+
+import numpy as np
+
+# Little-endian float32, so stored bytes read the same on every host
+_DTYPE = np.dtype("<f4")
+
+
+def serialize_embedding(embedding, as_json: bool = False, quantize: bool = False) -> str:
+    """
+    Encode an embedding for the AI Memory `embedding` (JSON) field.
+    
+    By default the float32 bytes are base64-encoded into a JSON string:
+    ~8 KB for 1536 dimensions instead of ~30 KB of float text, and no
+    Python float per value when read back. as_json=True writes the plain
+    JSON list of floats instead (readable, for debugging).
+    
+    quantize=True stores int8 values scaled by max(|v|)/127 as
+    {"q8": <base64>, "scale": <float>}: ~2 KB for 1536 dimensions, at a
+    cosine error around 1e-4.
+    """
+    if as_json:
+        return json.dumps(np.asarray(embedding, dtype=np.float64).tolist())
+    if quantize:
+        q8, scale = quantize_int8(embedding)
+        return json.dumps({"q8": base64.b64encode(q8.tobytes()).decode("ascii"), "scale": scale})
+    data = np.asarray(embedding, dtype=_DTYPE).tobytes()
+    return json.dumps(base64.b64encode(data).decode("ascii"))
+
+
+def quantize_int8(embedding) -> Tuple[np.ndarray, float]:
+    """Symmetric per-vector int8 quantization: (values, scale) with embedding ~= values * scale"""
+    v = np.asarray(embedding, dtype=np.float32)
+    peak = float(np.abs(v).max()) if v.size else 0.0
+    scale = peak / 127 if peak else 1.0
+    return np.clip(np.rint(v / scale), -127, 127).astype(np.int8), scale
+
+
+def deserialize_embedding(raw: str) -> np.ndarray:
+    """Decode a stored embedding (any form, including legacy JSON lists) to a float32 vector"""
+    value = json.loads(raw)
+    if isinstance(value, str):
+        return np.frombuffer(base64.b64decode(value, validate=True), dtype=_DTYPE)
+    if isinstance(value, dict):
+        q8 = np.frombuffer(base64.b64decode(value["q8"], validate=True), dtype=np.int8)
+        return q8.astype(np.float32) * np.float32(value["scale"])
+    return np.asarray(value, dtype=np.float32)
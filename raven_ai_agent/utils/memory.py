@@ -5,9 +5,7 @@ from datetime import datetime, timedelta
 
 def generate_daily_summaries():
     """Scheduled job: Generate daily summaries for all users with memories"""
-    settings = frappe.get_single("AI Agent Settings")
-    
-    if not settings.generate_daily_summaries:
+    if not frappe.db.get_single_value("AI Agent Settings", "generate_daily_summaries"):
         return
     
     # Get users with memories from today
@@ -43,28 +41,45 @@ def generate_user_summary(user: str):
 
 def cleanup_old_memories():
     """Remove expired and old non-critical memories"""
-    settings = frappe.get_single("AI Agent Settings")
-    retention_days = settings.memory_retention_days or 90
+    retention_days = frappe.db.get_single_value("AI Agent Settings", "memory_retention_days") or 90
     
     cutoff_date = datetime.now() - timedelta(days=retention_days)
     
-    # Delete expired memories
-    frappe.db.delete("AI Memory", {
-        "expires_on": ["<", datetime.now().date()],
-        "expires_on": ["is", "set"]
-    })
-    
-    # Delete old low-importance memories
-    frappe.db.delete("AI Memory", {
-        "creation": ["<", cutoff_date],
-        "importance": ["in", ["Low", "Normal"]]
-    })
+    # One pass for both rules: expired memories, and old low-importance ones.
+    # Served by the (expires_on) and (importance, creation) indexes, see
+    # AI Memory on_doctype_update()
+    frappe.db.sql("""
+        DELETE FROM `tabAI Memory`
+        WHERE (expires_on IS NOT NULL AND expires_on < CURDATE())
+            OR (creation < %s AND importance IN ('Low', 'Normal'))
+    """, (cutoff_date,))
     
     frappe.db.commit()
 
 
 def search_similar_memories(user: str, query: str, limit: int = 5):
-    """Search memories using keyword matching (upgrade to vector for production)"""
+    """
+    Search memories by keyword. Semantic ranking is opt-in through
+    vector_store.vector_search, which calls the embeddings API.
+    
+    Ranks by relevance through the ft_content FULLTEXT index (patch
+    add_ai_memory_fulltext_index). Falls back to a LIKE scan when the index
+    is missing or finds nothing: InnoDB FULLTEXT skips short words and
+    stopwords, and does not see rows not yet committed.
+    """
+    names = _fulltext_memory_names(user, query, limit)
+    if names:
+        # Read the rows through get_list so the usual permission checks apply
+        results = frappe.get_list(
+            "AI Memory",
+            filters={"user": user, "name": ["in", names]},
+            fields=["name", "content", "importance", "memory_type", "source", "creation"]
+        )
+        if results:
+            rank = {name: i for i, name in enumerate(names)}
+            results.sort(key=lambda m: rank[m.name])
+            return results
+    
     return frappe.get_list(
         "AI Memory",
         filters={
@@ -75,3 +90,29 @@ def search_similar_memories(user: str, query: str, limit: int = 5):
         order_by="importance desc, creation desc",
         limit=limit
     )
+
+
+def _fulltext_memory_names(user: str, query: str, limit: int):
+    """
+    Names of the user's memories matching query, most relevant first,
+    through the ft_content FULLTEXT index; None when unavailable (not
+    MariaDB, or the index is missing). The statement runs in a savepoint
+    so a failure leaves the caller's transaction usable.
+    """
+    if frappe.db.db_type != "mariadb":
+        return None
+    frappe.db.savepoint("ai_memory_fulltext")
+    try:
+        rows = frappe.db.sql("""
+            SELECT name
+            FROM `tabAI Memory`
+            WHERE user = %(user)s
+                AND MATCH(content) AGAINST(%(query)s IN NATURAL LANGUAGE MODE)
+            ORDER BY MATCH(content) AGAINST(%(query)s IN NATURAL LANGUAGE MODE) DESC, creation DESC
+            LIMIT %(limit)s
+        """, {"query": query, "user": user, "limit": limit})
+    except Exception as e:
+        frappe.db.rollback(save_point="ai_memory_fulltext")
+        frappe.logger().warning(f"[Memory] FULLTEXT search unavailable: {e}")
+        return None
+    return [row[0] for row in rows]
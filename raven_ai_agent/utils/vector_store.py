@@ -2,11 +2,23 @@
 Vector Search Utilities for AI Memory
 Uses OpenAI embeddings with cosine similarity
 """
+import time
+from collections import OrderedDict
+
 import frappe
-import json
 import numpy as np
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from openai import OpenAI
+from raven_ai_agent.utils.embeddings import deserialize_embedding, serialize_embedding
+
+# (site, session user, memory owner) -> (stored_at, fingerprint, memories,
+# unit-norm embedding matrix). A user's memories are parsed and normalized
+# once and reused until a memory is added, edited or deleted (the fingerprint
+# changes). Bounded: least recently used entries beyond MATRIX_CACHE_MAX are
+# dropped, and entries older than MATRIX_CACHE_TTL are rebuilt.
+MATRIX_CACHE_MAX = 32
+MATRIX_CACHE_TTL = 300.0  # seconds
+_MATRIX_CACHE: "OrderedDict[tuple, tuple]" = OrderedDict()
 
 
 class VectorStore:
@@ -37,11 +49,36 @@ class VectorStore:
     
     @staticmethod
     def cosine_similarity(a: List[float], b: List[float]) -> float:
-        """Calculate cosine similarity between two vectors"""
-        a = np.array(a)
-        b = np.array(b)
+        """Calculate cosine similarity between two vectors (float32; float32 arrays are not copied)"""
+        a = np.asarray(a, dtype=np.float32)
+        b = np.asarray(b, dtype=np.float32)
         return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
     
+    @staticmethod
+    def cosine_similarities(matrix, q: List[float]) -> np.ndarray:
+        """Cosine similarity of every row of matrix against q, as one matrix-vector product"""
+        matrix = np.asarray(matrix, dtype=np.float32)
+        q = np.asarray(q, dtype=np.float32)
+        return (matrix @ q) / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(q))
+    
+    @staticmethod
+    def _parse_embedding(raw: str) -> np.ndarray:
+        """Stored embedding (binary or legacy JSON list) as a float32 vector"""
+        return deserialize_embedding(raw)
+    
+    @staticmethod
+    def _serialize_embedding(embedding: List[float]) -> str:
+        """
+        Stored form of an embedding. Site config `ai_memory_embeddings_int8`
+        stores int8 (4x smaller to fetch and decode); `ai_memory_embeddings_as_json`
+        keeps plain JSON for debugging
+        """
+        return serialize_embedding(
+            embedding,
+            as_json=bool(frappe.conf.get("ai_memory_embeddings_as_json")),
+            quantize=bool(frappe.conf.get("ai_memory_embeddings_int8")),
+        )
+    
     def store_memory_with_embedding(
         self,
         user: str,
@@ -60,7 +97,7 @@ class VectorStore:
             "importance": importance,
             "memory_type": memory_type,
             "source": source or "Conversation",
-            "embedding": json.dumps(embedding)
+            "embedding": self._serialize_embedding(embedding)
         })
         doc.insert(ignore_permissions=True)
         frappe.db.commit()
@@ -76,47 +113,71 @@ class VectorStore:
     ) -> List[Dict]:
         """Search for similar memories using vector similarity"""
         
+        memories, matrix = self._embedding_matrix(user)
+        if importance_filter:
+            keep = [i for i, m in enumerate(memories) if m.importance in importance_filter]
+            memories, matrix = [memories[i] for i in keep], matrix[keep]
+        if not memories:
+            return []
+        
         # Get query embedding
-        query_embedding = self.get_embedding(query)
+        query_embedding = np.asarray(self.get_embedding(query), dtype=np.float32)
         
-        # Build filters
-        filters = {"user": user}
-        if importance_filter:
-            filters["importance"] = ["in", importance_filter]
+        # Rows are unit-norm: one matrix-vector product scores every memory
+        similarities = (matrix @ query_embedding) / np.linalg.norm(query_embedding)
+        top = np.flatnonzero(similarities >= similarity_threshold)
+        top = top[np.argsort(-similarities[top], kind="stable")][:limit]
+        return [
+            frappe._dict(
+                name=memories[i].name,
+                content=memories[i].content,
+                importance=memories[i].importance,
+                memory_type=memories[i].memory_type,
+                source=memories[i].source,
+                similarity=round(float(similarities[i]), 4),
+                creation=memories[i].creation
+            )
+            for i in top
+        ]
+    
+    def _embedding_matrix(self, user: str) -> Tuple[list, np.ndarray]:
+        """A user's embedded memories and their unit-norm float32 matrix, cached per process (_MATRIX_CACHE)"""
+        fingerprint = tuple(frappe.db.sql("""
+            SELECT COUNT(*), MAX(modified) FROM `tabAI Memory`
+            WHERE user = %s AND embedding IS NOT NULL
+        """, (user,))[0])
+        key = (frappe.local.site, frappe.session.user, user)
+        cached = _MATRIX_CACHE.get(key)
+        if (cached is not None and cached[1] == fingerprint
+                and time.monotonic() - cached[0] < MATRIX_CACHE_TTL):
+            _MATRIX_CACHE.move_to_end(key)
+            return cached[2], cached[3]
         
-        # Get all memories with embeddings for this user
         memories = frappe.get_list(
             "AI Memory",
-            filters=filters,
+            filters={"user": user, "embedding": ["is", "set"]},
             fields=["name", "content", "importance", "memory_type", "source", "embedding", "creation"]
         )
-        
-        # Calculate similarities
-        results = []
+        candidates = []
+        embeddings = []
         for memory in memories:
-            if not memory.embedding:
-                continue
-            
             try:
-                stored_embedding = json.loads(memory.embedding)
-                similarity = self.cosine_similarity(query_embedding, stored_embedding)
-                
-                if similarity >= similarity_threshold:
-                    results.append({
-                        "name": memory.name,
-                        "content": memory.content,
-                        "importance": memory.importance,
-                        "memory_type": memory.memory_type,
-                        "source": memory.source,
-                        "similarity": round(similarity, 4),
-                        "creation": memory.creation
-                    })
-            except (json.JSONDecodeError, TypeError):
+                embeddings.append(self._parse_embedding(memory.embedding))
+            except (ValueError, TypeError):  # bad JSON / base64 included
                 continue
+            memory.pop("embedding")
+            candidates.append(memory)
         
-        # Sort by similarity and return top results
-        results.sort(key=lambda x: x["similarity"], reverse=True)
-        return results[:limit]
+        if embeddings:
+            matrix = np.stack(embeddings)
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        else:
+            matrix = np.empty((0, self.EMBEDDING_DIMENSIONS), dtype=np.float32)
+        _MATRIX_CACHE[key] = (time.monotonic(), fingerprint, candidates, matrix)
+        _MATRIX_CACHE.move_to_end(key)
+        while len(_MATRIX_CACHE) > MATRIX_CACHE_MAX:
+            _MATRIX_CACHE.popitem(last=False)
+        return candidates, matrix
     
     def update_missing_embeddings(self, user: str = None, batch_size: int = 50):
         """Backfill embeddings for memories that don't have them"""
@@ -144,7 +205,7 @@ class VectorStore:
                 "AI Memory",
                 memory.name,
                 "embedding",
-                json.dumps(embedding)
+                self._serialize_embedding(embedding)
             )
         
         frappe.db.commit()
@@ -160,29 +221,33 @@ class VectorStore:
         
         duplicates = []
         checked = set()
+        if not memories:
+            return duplicates
+        
+        # Parse each embedding and its norm once; each memory is then
+        # compared with all later ones in one matrix-vector product
+        embeddings = np.stack([self._parse_embedding(m.embedding) for m in memories])
+        norms = np.linalg.norm(embeddings, axis=1)
         
         for i, mem1 in enumerate(memories):
             if mem1.name in checked:
                 continue
             
-            emb1 = json.loads(mem1.embedding)
+            similarities = (embeddings[i+1:] @ embeddings[i]) / (norms[i+1:] * norms[i])
             
-            for mem2 in memories[i+1:]:
+            for offset in np.flatnonzero(similarities >= threshold):
+                mem2 = memories[i + 1 + offset]
                 if mem2.name in checked:
                     continue
                 
-                emb2 = json.loads(mem2.embedding)
-                similarity = self.cosine_similarity(emb1, emb2)
-                
-                if similarity >= threshold:
-                    duplicates.append({
-                        "memory_1": mem1.name,
-                        "memory_2": mem2.name,
-                        "content_1": mem1.content,
-                        "content_2": mem2.content,
-                        "similarity": round(similarity, 4)
-                    })
-                    checked.add(mem2.name)
+                duplicates.append({
+                    "memory_1": mem1.name,
+                    "memory_2": mem2.name,
+                    "content_1": mem1.content,
+                    "content_2": mem2.content,
+                    "similarity": round(float(similarities[offset]), 4)
+                })
+                checked.add(mem2.name)
         
         return duplicates
 
@@ -1,10 +1,18 @@
 """
 Voice Module - Text-to-Speech Integration
-"""
 
-from .elevenlabs import ElevenLabsVoice, VoiceResponseHandler
+ElevenLabsVoice and VoiceResponseHandler are imported on first access
+(PEP 562), so importing the package does not pull in the HTTP client.
+"""
 
 __all__ = [
     "ElevenLabsVoice",
     "VoiceResponseHandler"
 ]
+
+
+def __getattr__(name):
+    if name in __all__:
+        from . import elevenlabs
+        return getattr(elevenlabs, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
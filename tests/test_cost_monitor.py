@@ -0,0 +1,101 @@
+"""cost_monitor: usage logging, pricing and usage aggregation."""
+import types
+from unittest.mock import MagicMock
+
+import pytest
+
+
+@pytest.fixture()
+def frappe_mock(monkeypatch):
+    import frappe
+    if not hasattr(frappe, "logger"):
+        frappe.logger = MagicMock(return_value=MagicMock())
+    monkeypatch.setattr(frappe.db, "sql", MagicMock(side_effect=RuntimeError("no log")), raising=False)
+    # default budget settings
+    monkeypatch.setattr(frappe, "get_cached_doc", MagicMock(side_effect=RuntimeError("no settings")), raising=False)
+    return frappe
+
+
+class TestSettings:
+    def test_settings_come_from_cached_single(self, frappe_mock, monkeypatch):
+        from raven_ai_agent.utils.cost_monitor import CostMonitor
+        settings = types.SimpleNamespace(daily_budget=5.0, enable_cost_tracking=0)
+        monkeypatch.setattr(frappe_mock, "get_cached_doc", MagicMock(return_value=settings), raising=False)
+        monitor = CostMonitor()
+
+        frappe_mock.get_cached_doc.assert_called_once_with("AI Agent Settings")
+        assert (monitor.settings["daily_budget"], monitor.settings["monthly_budget"]) == (5.0, 100.0)
+        assert monitor.record_usage("openai", "gpt-4o", 10, 10) == (0.0, None)
+
+
+class TestUsageLog:
+    def test_usage_is_logged_with_one_insert_and_no_commit(self, frappe_mock):
+        from raven_ai_agent.utils.cost_monitor import CostMonitor
+        frappe_mock.db.sql = MagicMock(return_value=[])
+        frappe_mock.db.commit = MagicMock()
+        CostMonitor().record_usage("openai", "gpt-4o", 1_000_000, 0, user="u@x.com")
+
+        query, values = frappe_mock.db.sql.call_args_list[0][0]
+        assert "INSERT INTO `tabAI Usage Log`" in query
+        assert len(values[0]) == 32
+        assert values[1:7] == ("u@x.com", "openai", "gpt-4o", 1_000_000, 0, 2.5)
+        assert values[7] == values[8] == values[9]
+        frappe_mock.db.commit.assert_not_called()
+
+    def test_unreadable_log_counts_as_no_usage(self, frappe_mock):
+        from raven_ai_agent.utils.cost_monitor import CostMonitor
+        monitor = CostMonitor()
+        cost, alert = monitor.record_usage("openai", "gpt-4o", 1_000_000, 0, user="u@x.com")
+
+        assert (cost, alert) == (2.5, None)
+        assert monitor.get_usage_periods("hour", "day") == {"hour": 0.0, "day": 0.0}
+
+
+class TestCostCalculation:
+    def test_scalar_cost_uses_price_pairs_and_default(self, frappe_mock):
+        from raven_ai_agent.utils.cost_monitor import CostMonitor
+        monitor = CostMonitor()
+        assert monitor.calculate_cost("gpt-4o", 1_000_000, 100_000) == 3.5
+        assert monitor.calculate_cost("deepseek-chat", 123_456, 7_890) == 0.019493
+        assert monitor.calculate_cost("unknown-model", 500_000, 250_000) == 1.0
+        assert CostMonitor._PRICE_PAIRS["gpt-4o-mini"] == (0.15, 0.60)
+
+
+class TestUsageQueries:
+    def test_period_totals_come_from_one_query(self, frappe_mock):
+        from raven_ai_agent.utils.cost_monitor import CostMonitor
+        frappe_mock.db.sql = MagicMock(return_value=[{"p0": 1.5, "p1": 20, "p2": None}])
+        usage = CostMonitor().get_usage_periods("day", "month", "hour")
+
+        assert usage == {"day": 1.5, "month": 20.0, "hour": 0.0}
+        assert frappe_mock.db.sql.call_count == 1
+        params = frappe_mock.db.sql.call_args[0][1]
+        assert params["since"] == min(params["p0"], params["p1"], params["p2"])
+
+    def test_report_rolls_up_one_grouped_scan(self, frappe_mock):
+        from datetime import date
+        from raven_ai_agent.utils.cost_monitor import CostMonitor
+
+        def row(provider, model, user, day, cost, requests=1):
+            return {"provider": provider, "model": model, "user": user, "date": date(2026, 10, day),
+                    "total_input": 100 * requests, "total_output": 10 * requests,
+                    "total_cost": cost, "requests": requests}
+
+        frappe_mock.db.sql = MagicMock(return_value=[
+            row("openai", "gpt-4o", "a", 17, 6.0, 2), row("openai", "gpt-4o-mini", "b", 18, 1.0),
+            row("deepseek", "deepseek-chat", "a", 17, 0.5), row("openai", "gpt-4o", "b", 18, 0.25),
+        ])
+        report = CostMonitor().get_usage_report(days=7)
+
+        assert frappe_mock.db.sql.call_count == 1
+        assert report["by_provider"] == [
+            {"provider": "openai", "total_input": 400, "total_output": 40, "total_cost": 7.25, "requests": 4},
+            {"provider": "deepseek", "total_input": 100, "total_output": 10, "total_cost": 0.5, "requests": 1},
+        ]
+        assert [(m["model"], m["total_cost"]) for m in report["by_model"]] == [
+            ("gpt-4o", 6.25), ("gpt-4o-mini", 1.0), ("deepseek-chat", 0.5)]
+        assert [(u["user"], u["total_cost"]) for u in report["by_user"]] == [("a", 6.5), ("b", 1.25)]
+        assert report["daily_trend"] == [{"date": date(2026, 10, 17), "cost": 6.5},
+                                         {"date": date(2026, 10, 18), "cost": 1.25}]
+        assert (report["total_cost"], report["total_requests"]) == (7.75, 5)
+        assert report["recommendations"]
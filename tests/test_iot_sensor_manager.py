@@ -0,0 +1,292 @@
+"""iot_sensor_manager skill: latest-reading queries against the ingestion schema."""
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+
+@pytest.fixture()
+def frappe_mock(monkeypatch):
+    import frappe
+    if not hasattr(frappe, "logger"):
+        frappe.logger = MagicMock(return_value=MagicMock())
+    frappe.get_all = MagicMock(return_value=[])
+    # frappe mock module is shared across files: restore these afterwards
+    monkeypatch.setattr(frappe.db, "get_value", MagicMock(return_value=None), raising=False)
+    monkeypatch.setattr(frappe.db, "bulk_insert", MagicMock(), raising=False)
+    monkeypatch.setattr(frappe.db, "commit", MagicMock(), raising=False)
+    series = iter(range(1, 10_000))
+    naming = MagicMock(make_autoname=MagicMock(side_effect=lambda key, doctype: f"IOT-SR-{next(series):04d}"))
+    monkeypatch.setitem(sys.modules, "frappe.model.naming", naming)
+    from raven_ai_agent.skills.iot_sensor_manager import skill
+    skill._READING_CACHE.clear()
+    return frappe
+
+
+def _skill():
+    from raven_ai_agent.skills.iot_sensor_manager.skill import IoTSensorManagerSkill
+    return IoTSensorManagerSkill()
+
+
+class TestLatestReadingsBulk:
+    def test_status_reads_every_sensor_in_one_query(self, frappe_mock):
+        frappe_mock.get_all.return_value = [
+            {"sensor_type": "DHT11", "temperature": 24.5, "humidity": 55.0,
+             "soil_moisture": None, "timestamp": "2026-10-18 10:00:02"},
+            {"sensor_type": "Soil Moisture", "temperature": None, "humidity": None,
+             "soil_moisture": 41.0, "timestamp": "2026-10-18 10:00:01"},
+            {"sensor_type": "DHT11", "temperature": 99.0, "humidity": 99.0,
+             "soil_moisture": None, "timestamp": "2026-10-18 09:59:00"},
+        ]
+        result = _skill()._handle_status("L01")
+
+        assert frappe_mock.get_all.call_count == 1
+        kwargs = frappe_mock.get_all.call_args.kwargs
+        assert kwargs["filters"]["device_name"] == "L01"
+        assert set(kwargs["filters"]["sensor_type"][1]) == {"Ford Temperature", "DHT11", "Soil Moisture"}
+        assert "Temperature: 24.5 C" in result["response"]
+        assert "Humidity: 55.0 %" in result["response"]
+        assert "Soil: 41.0" in result["response"]
+        assert "99.0" not in result["response"]
+
+    def test_crowded_out_type_gets_its_own_query(self, frappe_mock):
+        from raven_ai_agent.skills.iot_sensor_manager.skill import BULK_ROWS_PER_TYPE
+        window = [{"sensor_type": "DHT11", "temperature": 20.0, "humidity": 50.0,
+                   "soil_moisture": None, "timestamp": "t"}] * (3 * BULK_ROWS_PER_TYPE)
+        frappe_mock.get_all.return_value = window
+        frappe_mock.db.get_value.return_value = {
+            "sensor_type": "Soil Moisture", "soil_moisture": 12, "creation": "old",
+        }
+
+        latest = _skill()._get_latest_readings_bulk("L02")
+
+        assert frappe_mock.get_all.call_count == 1
+        frappe_mock.db.get_value.assert_called_once()
+        assert latest["soil"]["value"] == 12
+        assert latest["temperature"]["value"] == 20.0
+
+    def test_single_type_uses_get_value_and_keeps_reading_shape(self, frappe_mock):
+        frappe_mock.db.get_value.return_value = {
+            "sensor_type": "Ford Temperature", "temperature": 31.0, "creation": "t",
+        }
+        reading = _skill()._get_latest_reading("L03", "temperature")
+        assert reading == {"value": 31.0, "sensor_type": "Ford Temperature", "timestamp": "t", "unit": "C"}
+        args, kwargs = frappe_mock.db.get_value.call_args
+        assert args[1] == {"device_name": "L03", "sensor_type": ["in", ["Ford Temperature", "DHT11"]]}
+        assert kwargs == {"as_dict": True, "order_by": "creation desc"}
+        frappe_mock.get_all.assert_not_called()
+        assert _skill()._get_latest_reading("L03", "motion") is None
+
+    def test_history_reuses_one_base_query_per_value_column(self, frappe_mock, monkeypatch):
+        from raven_ai_agent.skills.iot_sensor_manager import skill as module
+        monkeypatch.setattr(frappe_mock, "qb", MagicMock(), raising=False)
+        monkeypatch.setattr(module, "_HISTORY_QUERIES", {})
+        base = frappe_mock.qb.from_.return_value.select.return_value.orderby.return_value
+        run = base.where.return_value.where.return_value.limit.return_value.run
+        run.return_value = [{"value": 50.0, "timestamp": "t"}]
+
+        assert _skill()._get_reading_history("L08", "humidity", limit=5) == [
+            {"value": 50.0, "timestamp": "t", "unit": "%"}]
+        _skill()._get_reading_history("L09", "humidity")
+        _skill()._get_reading_history("L09", "soil")
+
+        assert frappe_mock.qb.from_.call_count == 2  # humidity, soil_moisture
+        base.where.return_value.where.return_value.limit.assert_any_call(5)
+        run.assert_called_with(as_dict=True)
+        assert run.call_count == 3
+
+
+class TestReadingCache:
+    def test_repeat_queries_within_ttl_skip_the_db(self, frappe_mock, monkeypatch):
+        from raven_ai_agent.skills.iot_sensor_manager import skill as module
+        frappe_mock.get_all.return_value = [
+            {"sensor_type": "DHT11", "temperature": 22.0, "humidity": 40.0, "timestamp": "t"},
+        ]
+        monkeypatch.setattr(module, "_history_rows", MagicMock(return_value=[{"value": 40.0, "timestamp": "t"}]))
+        skill = _skill()
+        skill._handle_status("L04")
+        skill._handle_alerts("L04")
+        skill._get_reading_history("L04", "humidity")
+        skill._get_reading_history("L04", "humidity")
+        assert frappe_mock.get_all.call_count == 1
+        assert module._history_rows.call_count == 1
+
+    def test_expired_entries_are_refetched(self, frappe_mock, monkeypatch):
+        from raven_ai_agent.skills.iot_sensor_manager import skill as module
+        now = [1000.0]
+        monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+        skill = _skill()
+        skill._get_latest_reading("L05", "temperature")
+        skill._get_latest_reading("L05", "temperature")
+        now[0] += module.READING_CACHE_TTL + 0.1
+        skill._get_latest_reading("L05", "temperature")
+        assert frappe_mock.db.get_value.call_count == 2
+
+    def test_log_reading_invalidates_that_bot(self, frappe_mock):
+        from raven_ai_agent.skills.iot_sensor_manager.skill import IoTSensorManagerSkill
+        skill = _skill()
+        skill._get_latest_reading("L06", "temperature")
+        skill._get_latest_reading("L07", "temperature")
+        IoTSensorManagerSkill.log_reading("L06", "temperature", 30.0)
+        skill._get_latest_reading("L06", "temperature")
+        skill._get_latest_reading("L07", "temperature")
+        assert frappe_mock.db.get_value.call_count == 3
+
+
+class TestStatusTimestamp:
+    def test_formatted_once_per_second(self, frappe_mock, monkeypatch):
+        from datetime import datetime
+        from raven_ai_agent.skills.iot_sensor_manager import skill as module
+        now = [1_800_000_000.2]
+        monkeypatch.setattr(module.time, "time", lambda: now[0])
+        monkeypatch.setattr(module, "_TS_CACHE", [0, ""])
+        first = module._now_str()
+        assert first == datetime.fromtimestamp(1_800_000_000).strftime("%Y-%m-%d %H:%M:%S")
+        now[0] += 0.5
+        assert module._now_str() is first
+        now[0] += 0.5
+        assert module._now_str() != first
+        assert f"Last check: {module._now_str()}" in _skill()._handle_status("L01")["response"]
+
+
+class TestExtractBotId:
+    def test_bot_ids_are_zero_padded(self, frappe_mock):
+        skill = _skill()
+        assert skill._extract_bot_id("status of l7 sensors") == "L07"
+        assert skill._extract_bot_id("temperatura de l12") == "L12"
+        assert skill._extract_bot_id("sensor status") == "L01"
+
+
+class TestKeywordScanner:
+    def test_matches_substring_checks(self, frappe_mock):
+        import random
+        from raven_ai_agent.skills.iot_sensor_manager.skill import keyword_scanner
+        words = {"report", "reporte", "alert", "alerta", "last", "read", "all sensor", "log"}
+        scan = keyword_scanner(words)
+        rng = random.Random(7)
+        pieces = sorted(words) + ["ing", "ly", " ", "x", "al", "re"]
+        for _ in range(500):
+            query = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 8)))
+            assert scan(query) == {w for w in words if w in query}, query
+
+    def test_sensor_type_keeps_substring_priority(self, frappe_mock):
+        skill = _skill()
+        assert skill._detect_sensor_type("soil temperature l01") == "soil"
+        assert skill._detect_sensor_type("temps and humidity") == "temperature"
+        assert skill._detect_sensor_type("humidity on l02") == "humidity"
+        assert skill._detect_sensor_type("expired pir events") == "motion"
+        assert skill._detect_sensor_type("luz de l03") == "light"
+        assert skill._detect_sensor_type("sensor status") == "temperature"
+
+    def test_sensor_reading_still_routes_to_read(self, frappe_mock):
+        from unittest.mock import patch
+        from raven_ai_agent.skills.iot_sensor_manager.skill import IoTSensorManagerSkill
+        skill = _skill()
+        with patch.object(IoTSensorManagerSkill, "_handle_read", return_value={"handled": True}) as read:
+            skill.handle("sensor reading L01")
+        read.assert_called_once()
+
+    @pytest.mark.parametrize("query, handler", [
+        ("estado l01 alert", "_handle_status"),
+        ("critical history", "_handle_alerts"),
+        ("last temperature read", "_handle_history"),
+        ("medir humedad", "_handle_read"),
+        ("temperature l01", "_handle_status"),
+    ])
+    def test_first_matching_route_wins(self, frappe_mock, query, handler):
+        from unittest.mock import patch
+        from raven_ai_agent.skills.iot_sensor_manager.skill import IoTSensorManagerSkill
+        with patch.object(IoTSensorManagerSkill, handler, return_value={"handled": handler}):
+            assert _skill().handle(query)["handled"] == handler
+
+
+class TestDelegatingSkills:
+    def test_implied_type_ranks_like_a_prefixed_keyword(self, frappe_mock):
+        skill = _skill()
+        for query in ("humidity of soil l01", "temp for motion on l02", "luz l03", "l04"):
+            for implied in ("temperature", "humidity", "motion"):
+                assert skill._detect_sensor_type(query, implied) == \
+                    skill._detect_sensor_type(implied + " " + query), (query, implied)
+
+    def test_dedicated_skill_passes_query_through(self, frappe_mock):
+        from unittest.mock import patch
+        from raven_ai_agent.skills.iot_motion import IoTMotionSkill
+        from raven_ai_agent.skills.iot_sensor_manager.skill import IoTSensorManagerSkill
+        with patch.object(IoTSensorManagerSkill, "_handle_read", return_value={"handled": True}) as read:
+            IoTMotionSkill().handle("Any Motion on L05?")
+        read.assert_called_once_with("L05", "any motion on l05?", None, implied_type="motion")
+
+    def test_manager_is_created_once_per_skill(self, frappe_mock):
+        from raven_ai_agent.skills.iot_humidity import IoTHumiditySkill
+        from raven_ai_agent.skills.iot_sensor_manager.skill import IoTSensorManagerSkill
+        skill = IoTHumiditySkill(agent="agent")
+        skill.handle("humidity on l02")
+        manager = skill.manager
+        skill.handle("humidity history l02")
+        assert skill.manager is manager
+        assert isinstance(manager, IoTSensorManagerSkill) and manager.agent == "agent"
+        assert IoTHumiditySkill().manager is not manager
+
+
+class TestBulkWrites:
+    def test_readings_are_written_in_one_bulk_insert(self, frappe_mock):
+        from raven_ai_agent.skills.iot_sensor_manager import skill as module
+        names = module.IoTSensorManagerSkill.log_readings([
+            ("L01", "temperature", 21.5),
+            ("L01", "humidity", 48.0),
+            ("L02", "soil", 37),
+        ])
+        assert names == ["IOT-SR-0001", "IOT-SR-0002", "IOT-SR-0003"]
+        sys.modules["frappe.model.naming"].make_autoname.assert_called_with("IOT-SR-.####", "IoT Sensor Reading")
+        frappe_mock.db.bulk_insert.assert_called_once()
+        frappe_mock.db.commit.assert_called_once()
+        args, kwargs = frappe_mock.db.bulk_insert.call_args
+        assert args == ("IoT Sensor Reading",)
+        rows = [dict(zip(kwargs["fields"], row)) for row in kwargs["values"]]
+        assert [(r["device_name"], r["sensor_type"], r["sensor_id"]) for r in rows] == [
+            ("L01", "Ford Temperature", "L01-Ford Temperature"),
+            ("L01", "DHT11", "L01-DHT11"),
+            ("L02", "Soil Moisture", "L02-Soil Moisture"),
+        ]
+        assert (rows[0]["temperature"], rows[1]["humidity"], rows[2]["soil_moisture"]) == (21.5, 48.0, 37)
+        assert rows[0]["humidity"] is None
+
+    def test_log_reading_writes_before_returning(self, frappe_mock):
+        from raven_ai_agent.skills.iot_sensor_manager import skill as module
+        name = module.IoTSensorManagerSkill.log_reading("L01", "temperature", 20.0)
+        rows = frappe_mock.db.bulk_insert.call_args.kwargs["values"]
+        assert [row[0] for row in rows] == [name]
+
+    def test_failed_insert_returns_no_names(self, frappe_mock):
+        from raven_ai_agent.skills.iot_sensor_manager import skill as module
+        frappe_mock.db.bulk_insert.side_effect = RuntimeError("db down")
+        assert module.IoTSensorManagerSkill.log_reading("L01", "soil", 30) is None
+        frappe_mock.db.commit.assert_not_called()
+
+    def test_out_of_range_humidity_is_rejected(self, frappe_mock):
+        from raven_ai_agent.skills.iot_sensor_manager import skill as module
+        names = module.IoTSensorManagerSkill.log_readings([("L01", "humidity", 140.0), ("L01", "humidity", 40.0)])
+        assert names[0] is None and names[1]
+        assert len(frappe_mock.db.bulk_insert.call_args.kwargs["values"]) == 1
+
+
+class TestThresholds:
+    def test_threshold_labels(self, frappe_mock):
+        skill = _skill()
+        assert skill._check_thresholds("temperature", 4.0) == "🔴 CRITICAL LOW"
+        assert skill._check_thresholds("temperature", 45.0) == "🔴 CRITICAL HIGH"
+        assert skill._check_thresholds("temperature", 15.0) == "🟡 Low Warning"
+        assert skill._check_thresholds("temperature", 35.0) == "🟡 High Warning"
+        assert skill._check_thresholds("temperature", 24.0) == "✅ Normal"
+        # light has no critical bounds; motion and unknown types have none
+        assert skill._check_thresholds("light", 10_000.0) == "🟡 High Warning"
+        assert skill._check_thresholds("motion", 1) == "✅ Normal"
+        assert skill._check_thresholds("pressure", 1) == "✅ Normal"
+
+    def test_history_lines_have_no_alert_labels(self, frappe_mock, monkeypatch):
+        from raven_ai_agent.skills.iot_sensor_manager import skill as module
+        monkeypatch.setattr(module, "_history_rows", MagicMock(return_value=[
+            {"value": 46.0, "timestamp": "t2"}, {"value": None, "timestamp": "t1"},
+        ]))
+        response = _skill()._handle_history("L01", "temperature history")["response"]
+        assert response.endswith("  t2: 46.0 C\n  t1: None C")
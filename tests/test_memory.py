@@ -0,0 +1,70 @@
+"""memory: AI Memory retention cleanup and keyword search."""
+import types
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+
+@pytest.fixture()
+def frappe_mock(monkeypatch):
+    import frappe
+    if not hasattr(frappe, "logger"):
+        frappe.logger = MagicMock(return_value=MagicMock())
+    monkeypatch.setattr(frappe, "get_list", MagicMock(return_value=[]), raising=False)
+    monkeypatch.setattr(frappe.db, "sql", MagicMock(return_value=()), raising=False)
+    monkeypatch.setattr(frappe.db, "delete", MagicMock(), raising=False)
+    monkeypatch.setattr(frappe.db, "commit", MagicMock(), raising=False)
+    monkeypatch.setattr(frappe.db, "get_single_value", MagicMock(return_value=30), raising=False)
+    monkeypatch.setattr(frappe.db, "db_type", "mariadb", raising=False)
+    monkeypatch.setattr(frappe.db, "savepoint", MagicMock(), raising=False)
+    monkeypatch.setattr(frappe.db, "rollback", MagicMock(), raising=False)
+    return frappe
+
+
+def test_cleanup_is_one_delete_for_both_rules(frappe_mock):
+    from raven_ai_agent.utils.memory import cleanup_old_memories
+    cleanup_old_memories()
+
+    frappe_mock.db.delete.assert_not_called()
+    frappe_mock.db.sql.assert_called_once()
+    query, (cutoff,) = frappe_mock.db.sql.call_args[0]
+    assert "expires_on IS NOT NULL AND expires_on < CURDATE()" in query
+    assert "importance IN ('Low', 'Normal')" in query
+    assert abs(datetime.now() - timedelta(days=30) - cutoff) < timedelta(minutes=1)
+    frappe_mock.db.get_single_value.assert_called_once_with("AI Agent Settings", "memory_retention_days")
+    frappe_mock.db.commit.assert_called_once()
+
+
+class TestSearchSimilarMemories:
+    def test_ranks_with_fulltext_index(self, frappe_mock):
+        from raven_ai_agent.utils.memory import search_similar_memories
+        frappe_mock.db.sql.return_value = [("m2",), ("m1",)]
+        frappe_mock.get_list.return_value = [types.SimpleNamespace(name="m1"), types.SimpleNamespace(name="m2")]
+
+        assert [r.name for r in search_similar_memories("u@x.com", "dark mode", limit=3)] == ["m2", "m1"]
+        query, params = frappe_mock.db.sql.call_args[0]
+        assert "MATCH(content) AGAINST" in query and "LIKE" not in query
+        assert params == {"query": "dark mode", "user": "u@x.com", "limit": 3}
+        frappe_mock.db.savepoint.assert_called_once_with("ai_memory_fulltext")
+        assert frappe_mock.get_list.call_args.kwargs["filters"] == {"user": "u@x.com", "name": ["in", ["m2", "m1"]]}
+
+    @pytest.mark.parametrize("sql", [MagicMock(return_value=()), MagicMock(side_effect=RuntimeError("no index"))])
+    def test_falls_back_to_like_when_index_missing_or_no_match(self, frappe_mock, sql):
+        from raven_ai_agent.utils.memory import search_similar_memories
+        frappe_mock.db.sql = sql
+        frappe_mock.get_list.return_value = ["row"]
+
+        assert search_similar_memories("u@x.com", "ab") == ["row"]
+        assert frappe_mock.get_list.call_args.kwargs["filters"]["content"] == ["like", "%ab%"]
+        if sql.side_effect:
+            frappe_mock.db.rollback.assert_called_once_with(save_point="ai_memory_fulltext")
+
+    def test_other_databases_skip_fulltext(self, frappe_mock, monkeypatch):
+        from raven_ai_agent.utils.memory import search_similar_memories
+        monkeypatch.setattr(frappe_mock.db, "db_type", "postgres", raising=False)
+        frappe_mock.get_list.return_value = ["row"]
+
+        assert search_similar_memories("u@x.com", "dark mode") == ["row"]
+        frappe_mock.db.sql.assert_not_called()
+        frappe_mock.db.savepoint.assert_not_called()
@@ -81,6 +81,17 @@ class TestRouting:
                   "compare folio 00752", "migration report 2025"]:
             assert s.can_handle(q)[0], f"{q!r} lost"
 
+    @pytest.mark.parametrize("query, handler", [
+        ("scan migration 2024 and fix folio 00752", "_handle_scan"),
+        ("please fix folio 00752 confirm", "_handle_fix"),
+        ("Compare Folio 00752", "_handle_compare"),
+        ("show the migration report 2025", "_handle_report"),
+    ])
+    def test_legacy_phrases_route_anywhere_in_query(self, frappe_mock, query, handler):
+        from raven_ai_agent.skills.migration_fixer.skill import MigrationFixerSkill
+        with patch.object(MigrationFixerSkill, handler, return_value={"handled": handler}) as h:
+            assert _skill().handle(query)["handled"] == handler
+        h.assert_called_once_with(query.lower())
 
 class TestCensusReadOnly:
     """Fixture-level guard: the census/sources modules must contain no write
@@ -397,6 +408,60 @@ class TestBilingualAndHelp:
                     assert s.handle(q) is not None, f"claimed but unhandled: {q!r}"
 
 
+class TestLegacyScanRange:
+    def _tree(self, root):
+        (root / "2024" / "a").mkdir(parents=True)
+        (root / "00752.json").write_text('{"src": "top"}')
+        (root / "2024" / "folio_00753.json").write_text('{"src": "folio"}')
+        (root / "2024" / "invoice_00753.json").write_text('{"src": "invoice"}')
+        (root / "2024" / "a" / "00754.json").write_text('{"src": "deep"}')
+        return root
+
+    def test_indexed_lookup_matches_directory_search(self, frappe_mock, tmp_path):
+        from raven_ai_agent.skills.migration_fixer.fixer import MigrationFixer
+        fixer = MigrationFixer(str(self._tree(tmp_path)))
+        folios = ["00752", "00753", "00754", "00755"]
+        walked = [fixer.load_foxpro_json(f) for f in folios]
+        fixer._json_index = fixer._index_json_files()
+        assert [fixer.load_foxpro_json(f) for f in folios] == walked
+        assert walked[1] == {"src": "invoice"}
+
+    def test_scan_walks_the_tree_once(self, frappe_mock, tmp_path):
+        from raven_ai_agent.skills.migration_fixer import fixer as module
+        fixer = module.MigrationFixer(str(self._tree(tmp_path)))
+        with patch.object(module.MigrationFixer, "get_quotation_by_folio", return_value=None), \
+                patch.object(module.os, "walk", wraps=module.os.walk) as walk:
+            results = fixer.scan_range("00750", "00760")
+        assert walk.call_count == 1
+        assert results["scanned"] == len(results["details"]) == 11
+        assert fixer._json_index is None
+
+
+class TestLegacyFormatting:
+    def test_scan_results_show_top_five_issues(self, frappe_mock):
+        details = [{"folio": f"{i:05d}", "issues": ["Missing SO"] if i else []} for i in range(8)]
+        out = _skill()._format_scan_results(
+            {"scanned": 8, "ok": 0, "warnings": 3, "errors": 5, "details": details}, year=2024)
+        assert out.startswith("📊 **Migration Scan Results (2024)**\n\n| Status | Count |")
+        assert "| 📭 Missing | 0 |\n\n**Top Issues:**\n- `00000`: Unknown issue\n" in out
+        assert "`00005`" not in out
+        assert out.endswith("- `00004`: Missing SO\n\n*...and 3 more issues*")
+
+    def test_comparison_sections(self, frappe_mock):
+        out = _skill()._format_comparison({
+            "folio": "00752",
+            "erpnext": {"name": "SI-1", "customer": "LEGOSAN AB", "total": 1500},
+            "differences": [{"field": "total", "foxpro": 1400, "erpnext": 1500}],
+        })
+        assert out == (
+            "📋 **Comparison for Folio 00752**\n\n"
+            "**FoxPro:** ❌ Not found\n\n"
+            "**ERPNext (SI-1):**\n- Customer: LEGOSAN AB\n- Date: N/A\n"
+            "- Total: $1,500.00\n- Lote Real: N/A\n- Items: 0\n\n"
+            "**⚠️ Differences Found:**\n- `total`: FoxPro='1400' vs ERPNext='1500'\n"
+        )
+
+
 class TestBatchOriginW1:
     """W1 (Task #36, R-ID-1): the batch stage marks migrated lots
     origin=Migrated and keeps the legacy golden verbatim; O-1 hybrid lets a
@@ -281,6 +281,148 @@ class TestFrameworkRouterTolerance:
         assert any(m[0] == "bad" for m in matches2)  # bare-bool normalized
 
 
+class TestSkillBaseMatchers:
+    def test_compiled_matchers_follow_trigger_overrides(self, frappe_mock):
+        """can_handle() compiles once per class, but registry metadata that
+        replaces triggers must still take effect."""
+        from raven_ai_agent.skills.framework import SkillBase
+
+        class PatternSkill(SkillBase):
+            name = "pat"; description = "d"; triggers = ["Stock Level"]; patterns = [r"so-\d+"]
+            def handle(self, query, context=None):
+                return None
+
+        skill = PatternSkill()
+        assert skill.can_handle("STOCK LEVEL please") == (True, 0.8)
+        assert skill.can_handle("check SO-00754") == (True, 0.9)
+        assert PatternSkill._get_matchers() is PatternSkill._get_matchers()
+
+        PatternSkill.triggers = ["inventory"]
+        assert skill.can_handle("stock level please") == (False, 0.0)
+        assert skill.can_handle("inventory please") == (True, 0.8)
+        # A caller that already lowercased the query passes it through
+        assert skill.can_handle("INVENTORY", "inventory") == (True, 0.8)
+
+    def test_patterns_share_one_union_regex(self, frappe_mock):
+        from raven_ai_agent.skills.framework import _union_pattern
+
+        union = _union_pattern([r"so-\d+", r"show\s+(stock|inventory)"])
+        assert union.pattern == r"(?:so-\d+)|(?:show\s+(stock|inventory))"
+        assert union.search("please SHOW  inventory") and union.search("so-123")
+        assert not union.search("show me")
+        # Backreferences can't be renumbered into a union: searched one by one
+        separate = _union_pattern([r"(a)\1", r"(b)x"])
+        assert separate.search("aa") and separate.search("bx") and not separate.search("ab")
+        assert _union_pattern([]) is None
+
+
+class TestRegistryCandidateCache:
+    def test_repeat_query_reuses_can_handle_results(self, frappe_mock):
+        from raven_ai_agent.skills.framework import SkillRegistry, SkillRouter, SkillBase
+        calls = []
+
+        class CountingSkill(SkillBase):
+            name = "counting"; description = "d"; triggers = ["stock"]; patterns = []
+            def can_handle(self, query):
+                calls.append(query)
+                return super().can_handle(query)
+            def handle(self, query, context=None):
+                return None
+
+        registry = object.__new__(SkillRegistry)  # bypass the process singleton
+        registry._skills = {}
+        registry.register(CountingSkill)
+        router = SkillRouter(registry)
+        router._disabled_skills = lambda: set()
+
+        assert router._find_matches("stock for 0616") == [("counting", 0.8, 50)]
+        assert router._find_matches("stock for 0616") == [("counting", 0.8, 50)]
+        assert len(calls) == 1
+
+        # register() clears the cache, so the next lookup rescans
+        CountingSkill.priority = 70
+        registry.register(CountingSkill)
+        assert router._find_matches("stock for 0616") == [("counting", 0.8, 70)]
+        assert len(calls) == 2
+
+
+class TestRegistrySnapshot:
+    def test_get_all_is_shared_until_register(self, frappe_mock):
+        from raven_ai_agent.skills.framework import SkillRegistry, SkillBase
+
+        class OneSkill(SkillBase):
+            name = "one"; description = "d"; triggers = ["one"]
+            def handle(self, query, context=None):
+                return None
+
+        registry = object.__new__(SkillRegistry)  # bypass the process singleton
+        registry._skills = {}
+        registry.register(OneSkill)
+        snapshot = registry.get_all()
+        assert registry.get_all() is snapshot
+        with pytest.raises(TypeError):
+            snapshot["two"] = OneSkill  # read-only
+
+        class TwoSkill(OneSkill):
+            name = "two"
+        registry.register(TwoSkill)
+        assert list(registry.get_all()) == ["one", "two"]
+        assert list(snapshot) == ["one"]
+
+    def test_singleton_under_concurrent_construction(self, frappe_mock):
+        from concurrent.futures import ThreadPoolExecutor
+        from raven_ai_agent.skills.framework import SkillRegistry
+
+        with patch.object(SkillRegistry, "_instance", None):
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                instances = list(pool.map(lambda _: SkillRegistry(), range(32)))
+            assert len({id(instance) for instance in instances}) == 1
+
+
+class TestSkillFrontmatter:
+    def test_skill_md_reads_stop_at_closing_delimiter(self, frappe_mock, monkeypatch):
+        import io
+        from raven_ai_agent.skills import framework
+
+        class CountingFile(io.StringIO):
+            chars_read = 0
+
+            def read(self, size=-1):
+                text = super().read(size)
+                self.chars_read += len(text)
+                return text
+
+        skill_md = CountingFile("---\nname: demo\ntriggers: [a]\n---\n" + "body line\n" * 500)
+        monkeypatch.setattr(framework, "_SKILL_MD_CHUNK", 8)
+        registry = object.__new__(framework.SkillRegistry)
+        with patch("builtins.open", return_value=skill_md):
+            assert registry._parse_skill_md("SKILL.md") == {"name": "demo", "triggers": ["a"]}
+        assert skill_md.chars_read <= 40
+
+
+class TestSkillLearnerPatterns:
+    def test_action_words_match_anywhere_in_query(self, frappe_mock):
+        from raven_ai_agent.skills.framework import SkillLearner
+        patterns = SkillLearner._extract_patterns("Show stock list")
+        assert patterns == ("show stock", "stock list", "show stock list", "show", "list")
+        # action words are substring matches, as before the learner was memoized
+        assert "fix" in SkillLearner._extract_patterns("fix: stale batch")
+        assert "fix" in SkillLearner._extract_patterns("fixing the migration")
+
+    def test_flat_counters_survive_skill_growth(self, frappe_mock):
+        from raven_ai_agent.skills.framework import SkillLearner
+        learner = SkillLearner()
+        learner.record_match("show stock list", "stock", success=True)
+        learner.record_match("show stock list", "stock", success=False)
+        # More skills than the initial stride re-lays the counter rows out
+        for i in range(10):
+            learner.record_match("show stock list", f"skill{i}", success=True)
+        assert learner.get_confidence_boost("show stock list", "stock") == pytest.approx(0.1)
+        assert learner.get_confidence_boost("show stock list", "skill9") == pytest.approx(0.2)
+        assert learner.get_confidence_boost("show stock list", "unknown") == 0.0
+        assert learner.get_confidence_boost("other words", "stock") == 0.0
+
+
 class TestCoaOutranksDqs:
     def test_explicit_coa_id_beats_generic_validate_trigger(self, frappe_mock):
         """Screenshot regression: '@ai validate COA-26-0010' routed to
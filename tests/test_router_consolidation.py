@@ -47,6 +47,123 @@ class TestRouterParity:
         )
 
 
+class _StubSkill:
+    priority = 50
+
+    def __init__(self, name, triggers=(), patterns=()):
+        self.name = name
+        self.triggers = list(triggers)
+        self.patterns = list(patterns)
+
+    def handle(self, query, context=None):
+        return {"handled": True, "response": self.name}
+
+
+class TestLegacyRouterMatching:
+    def _router(self, *skills):
+        from raven_ai_agent.skills.router import SkillRouter as LegacyRouter
+        with patch.object(LegacyRouter, "_load_skills"):
+            router = LegacyRouter()
+        for skill in skills:
+            router.register_skill(skill)
+        return router
+
+    def test_patterns_compiled_once_across_routers(self, frappe_mock):
+        a = self._router(_StubSkill("a", patterns=[r"stock\s+of\s+\w+"]))
+        b = self._router(_StubSkill("a", patterns=[r"stock\s+of\s+\w+"]))
+        assert a._compiled_patterns["a"] is b._compiled_patterns["a"]
+        assert a.can_handle("STOCK OF aloe") and not a.can_handle("stock aloe")
+
+    def test_each_pattern_and_trigger_scores(self, frappe_mock):
+        two_patterns = _StubSkill("patterns", patterns=[r"batch\s+\d+", r"lote"])
+        three_triggers = _StubSkill("triggers", triggers=["batch", "lote", "Status"])
+        router = self._router(three_triggers, two_patterns)
+        # patterns: 2 x 20 = 40 beats triggers: 3 x 10 = 30
+        assert router.route("Batch 12 lote status")["response"] == "patterns"
+
+    def test_trigger_scan_counts_every_contained_trigger(self, frappe_mock):
+        import random
+        triggers = ["sensor", "sensor data", "data", "ensor", "status", "bot status", "s"]
+        router = self._router(_StubSkill("a", triggers=triggers[:4]),
+                              _StubSkill("b", triggers=triggers[3:] + ["Data"]))
+        rng = random.Random(3)
+        pieces = triggers + [" ", "x", "bot", "ta", "SENSOR", "Bot Status", "dAtA"]
+        for _ in range(300):
+            query = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 6)))
+            expected = {name: sum(t.lower() in query.lower() for t in skill.triggers)
+                        for name, skill in router.skills.items()}
+            hits = router._trigger_hits(query)
+            assert {n: hits.get(n, 0) for n in expected} == expected, query
+            assert router.can_handle(query) == any(expected.values())
+
+    def test_skill_that_fails_to_instantiate_is_skipped(self, frappe_mock):
+        from raven_ai_agent.skills.router import SkillRouter as LegacyRouter
+
+        class Broken(_StubSkill):
+            def __init__(self):
+                raise RuntimeError("no settings")
+
+        class Ok(_StubSkill):
+            def __init__(self):
+                super().__init__("ok", ["stock"])
+
+        registry = MagicMock()
+        registry.get_all.return_value = {"broken": Broken, "ok": Ok}
+        with patch("raven_ai_agent.skills.framework.get_registry", return_value=registry):
+            router = LegacyRouter()
+        assert list(router.skills) == ["ok"]
+        assert router.route("stock")["skill"] == "ok"
+
+    def test_priority_breaks_score_ties_then_registration_order(self, frappe_mock):
+        first, second, urgent = (_StubSkill(n, triggers=["stock"]) for n in ("first", "second", "urgent"))
+        urgent.priority = 90
+        router = self._router(first, second)
+        assert router.route("stock")["skill"] == "first"
+        router.register_skill(urgent)
+        assert router._priorities == {"first": 50, "second": 50, "urgent": 90}
+        assert router.route("stock")["skill"] == "urgent"
+
+    def test_score_outranks_priority(self, frappe_mock):
+        urgent = _StubSkill("urgent", triggers=["stock"])
+        urgent.priority = 99
+        router = self._router(urgent, _StubSkill("exact", triggers=["stock", "aloe"]))
+        assert router.route("stock of aloe")["skill"] == "exact"
+        assert router.route("stock")["skill"] == "urgent"
+
+    def test_skills_added_directly_still_match_patterns(self, frappe_mock):
+        router = self._router()
+        router.skills["late"] = _StubSkill("late", patterns=[r"^ping$"])
+        assert router.route("PING")["skill"] == "late"
+
+    def test_can_handle_reads_patterns_only_at_registration(self, frappe_mock):
+        reads = []
+
+        class Counted(_StubSkill):
+            @property
+            def patterns(self):
+                reads.append(1)
+                return [r"lote\s+\d+"]
+
+            @patterns.setter
+            def patterns(self, value):
+                pass
+
+        class Bare:
+            name, triggers = "bare", ["stock"]
+
+        router = self._router(Counted("counted"), Bare())
+        assert len(reads) == 1
+        assert router.can_handle("Lote 12") and router.can_handle("stock")
+        assert not router.can_handle("other")
+        assert len(reads) == 1
+
+    def test_can_handle_checks_triggers_and_patterns(self, frappe_mock):
+        router = self._router(_StubSkill("a", patterns=[r"(\w)\1"]),
+                              _StubSkill("b", triggers=["stock"]))
+        assert router.can_handle("aa") and router.can_handle("stock")
+        assert not router.can_handle("ab")
+
+
 class TestDispatcherStages:
     def _agent(self, provider=None, skill_matches=None, skill_result=None):
         agent = MagicMock()
@@ -0,0 +1,54 @@
+"""skill_creator: rendering and writing a new skill's files."""
+from unittest.mock import MagicMock
+
+import pytest
+
+
+@pytest.fixture()
+def frappe_mock():
+    import frappe
+    if not hasattr(frappe, "logger"):
+        frappe.logger = MagicMock(return_value=MagicMock())
+    return frappe
+
+
+def _skill(skills_dir):
+    from raven_ai_agent.skills.skill_creator.skill import SkillCreatorSkill
+    skill = SkillCreatorSkill()
+    skill.skills_dir = skills_dir
+    return skill
+
+
+class TestCreateSkill:
+    def test_writes_rendered_files(self, frappe_mock, tmp_path):
+        result = _skill(tmp_path).handle("create skill stock_probe", {"triggers": ["stock", "probe"]})
+
+        assert result["status"] == "success"
+        skill_dir = tmp_path / "stock_probe"
+        assert '    - "stock"\n    - "probe"' in (skill_dir / "SKILL.md").read_text()
+        skill_py = (skill_dir / "skill.py").read_text()
+        assert "class StockProbeSkill(SkillBase):" in skill_py
+        assert "triggers = ['stock', 'probe']" in skill_py
+        assert (skill_dir / "__init__.py").read_text().startswith("from .skill import StockProbeSkill")
+
+    def test_rendering_is_cached(self, frappe_mock, tmp_path):
+        from raven_ai_agent.skills.skill_creator.skill import _render_skill_files
+        _render_skill_files.cache_clear()
+        _skill(tmp_path / "a")._create_skill("demo", "Demo", ["demo"])
+        _skill(tmp_path / "b")._create_skill("demo", "Demo", ["demo"])
+        assert _render_skill_files.cache_info().hits == 1
+        assert (tmp_path / "a" / "demo" / "skill.py").read_text() == \
+            (tmp_path / "b" / "demo" / "skill.py").read_text()
+
+    def test_existing_skill_is_not_overwritten(self, frappe_mock, tmp_path):
+        (tmp_path / "demo").mkdir()
+        result = _skill(tmp_path)._create_skill("demo", "Demo", ["demo"])
+        assert result["status"] == "error"
+        assert list((tmp_path / "demo").iterdir()) == []
+
+    def test_files_are_utf8_and_truncated(self, frappe_mock, tmp_path):
+        from raven_ai_agent.skills.skill_creator.skill import _write_files
+        target = tmp_path / "SKILL.md"
+        target.write_text("x" * 100)
+        _write_files([(target, "análisis 🌡️")])
+        assert target.read_bytes() == "análisis 🌡️".encode("utf-8")
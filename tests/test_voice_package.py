@@ -0,0 +1,26 @@
+"""voice package: lazy export of the ElevenLabs classes."""
+import importlib
+import sys
+
+import pytest
+
+
+@pytest.fixture()
+def voice(monkeypatch):
+    for name in ("raven_ai_agent.voice", "raven_ai_agent.voice.elevenlabs"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    return importlib.import_module("raven_ai_agent.voice")
+
+
+def test_package_import_defers_elevenlabs(voice):
+    assert "raven_ai_agent.voice.elevenlabs" not in sys.modules
+    with pytest.raises(AttributeError):
+        voice.NotAVoice
+    assert "raven_ai_agent.voice.elevenlabs" not in sys.modules
+
+
+def test_classes_resolve_on_first_access(voice):
+    pytest.importorskip("requests")
+    from raven_ai_agent.voice.elevenlabs import ElevenLabsVoice, VoiceResponseHandler
+    assert voice.ElevenLabsVoice is ElevenLabsVoice
+    assert voice.VoiceResponseHandler is VoiceResponseHandler